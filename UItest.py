@@ -1,6 +1,6 @@
 import streamlit as st
 import random
-from PIL import Image, ImageDraw, ImageFont
+from style_engine import STYLE, AvatarRenderer, OutfitGenerator
 
 # ==============================================================================
 # CONFIG & STYLES
@@ -73,197 +73,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# ==============================================================================
-# DATA DEFINITIONS
-# ==============================================================================
-class StyleConfig:
-    GENRES = ["Streetwear", "Casual", "Minimal", "Techwear", "Vintage", "Formal"]
-    COLORS = ["Black", "White", "Gray", "Navy", "Brown", "Beige", "Green", "Red"]
-    
-    # Enhanced Palette (RGB)
-    COLOR_MAP = {
-        "Black": (20, 20, 20),
-        "White": (245, 245, 245),
-        "Gray": (120, 120, 125),
-        "Navy": (30, 45, 80),
-        "Brown": (100, 70, 50),
-        "Beige": (220, 210, 190),
-        "Green": (55, 90, 60),
-        "Red": (160, 40, 40)
-    }
-
-    OUTFIT_LIBRARY = {
-        "Streetwear": {
-            "inner": ["Oversized Tee", "Graphic Hoodie"],
-            "outer": ["Bomber Jacket", "Puffer Vest"],
-            "bottom": ["Cargo Pants", "Joggers"],
-            "skirt": ["Pleated Mini", "Sport Skirt"],
-            "shoe": ["Chunky Sneakers", "High Tops"]
-        },
-        "Casual": {
-            "inner": ["Cotton Tee", "Soft Knit"],
-            "outer": ["Denim Jacket", "Cardigan"],
-            "bottom": ["Straight Jeans", "Chinos"],
-            "skirt": ["A-Line Skirt", "Long Denim Skirt"],
-            "shoe": ["Low Sneakers", "Loafers"]
-        },
-        "Minimal": {
-            "inner": ["Mock Neck", "Crisp Shirt"],
-            "outer": ["Trench Coat", "Wool Coat"],
-            "bottom": ["Tapered Slacks", "Wide Trousers"],
-            "skirt": ["Silk Skirt", "Pencil Skirt"],
-            "shoe": ["Leather Boots", "Minimal Sneakers"]
-        },
-        "Techwear": {
-            "inner": ["Compression Top", "Tech Tee"],
-            "outer": ["Hardshell Parka", "Utility Vest"],
-            "bottom": ["Tech Cargo", "Nylon Pants"],
-            "skirt": ["Box Pleat Skirt", "Utility Skirt"],
-            "shoe": ["Tactical Boots", "Running Shoes"]
-        },
-        "Vintage": {
-            "inner": ["Ringer Tee", "Flannel Shirt"],
-            "outer": ["Corduroy Jacket", "Varsity Jacket"],
-            "bottom": ["Washed Jeans", "Corduroy Pants"],
-            "skirt": ["Checkered Skirt", "Midi Skirt"],
-            "shoe": ["Retro Trainers", "Leather Shoes"]
-        },
-        "Formal": {
-            "inner": ["Dress Shirt", "Silk Blouse"],
-            "outer": ["Tailored Blazer", "Long Coat"],
-            "bottom": ["Dress Trousers", "Pressed Slacks"],
-            "skirt": ["Wait Skirt", "Formal Midi"],
-            "shoe": ["Derby Shoes", "Heels"]
-        }
-    }
-
-# ==============================================================================
-# LOGIC CORE
-# ==============================================================================
-class OutfitGenerator:
-    @staticmethod
-    def get_complementary_color(base_color, all_colors):
-        # Basic pairings for better harmony
-        pairs = {
-            "Black": ["White", "Gray", "Beige", "Red"],
-            "White": ["Black", "Navy", "Beige", "Gray"],
-            "Navy": ["White", "Beige", "Gray"],
-            "Brown": ["Beige", "White", "Navy"],
-            "Beige": ["Brown", "Navy", "Black", "White"],
-            "Gray": ["Black", "White", "Navy"],
-            "Green": ["Beige", "Black", "White"],
-            "Red": ["Black", "White", "Denim"] # Denim handled as Navy visual often
-        }
-        candidates = pairs.get(base_color, all_colors)
-        return random.choice(candidates)
-
-    @staticmethod
-    def create(genre, base_color, gender, use_outer, all_colors):
-        lib = StyleConfig.OUTFIT_LIBRARY.get(genre, StyleConfig.OUTFIT_LIBRARY["Casual"])
-        
-        # Color Logic
-        accent_color = OutfitGenerator.get_complementary_color(base_color, all_colors)
-        
-        # Item Selection
-        is_skirt = (gender == "Female" and random.random() < 0.6)
-        
-        inner_item = random.choice(lib["inner"])
-        outer_item = random.choice(lib["outer"]) if use_outer else None
-        bottom_item = random.choice(lib["skirt"]) if is_skirt else random.choice(lib["bottom"])
-        shoe_item = random.choice(lib["shoe"])
-
-        return {
-            "genre": genre,
-            "main_color": base_color,
-            "accent_color": accent_color,
-            "items": {
-                "inner": inner_item,
-                "outer": outer_item,
-                "bottom": bottom_item,
-                "shoe": shoe_item
-            },
-            "meta": {
-                "is_skirt": is_skirt,
-                "has_outer": use_outer
-            }
-        }
-
-class AvatarRenderer:
-    @staticmethod
-    def render(outfit):
-        # High-res canvas for anti-aliasing (resize down later)
-        W, H = 500, 900
-        img = Image.new("RGB", (W, H), (250, 250, 250))
-        draw = ImageDraw.Draw(img)
-
-        # Colors
-        c_main = StyleConfig.COLOR_MAP[outfit["main_color"]]
-        c_accent = StyleConfig.COLOR_MAP[outfit["accent_color"]]
-        c_skin = (235, 215, 200)
-        c_hair = (40, 30, 30)
-        
-        # Helper to darken a color slightly for outlines/shading
-        def shade(rgb, factor=0.85):
-            return tuple(int(x * factor) for x in rgb)
-
-        # --- DRAWING LAYERS ---
-        
-        # 1. Body/Head
-        # Head
-        draw.ellipse([200, 50, 300, 160], fill=c_skin)
-        # Neck
-        draw.rectangle([235, 150, 265, 190], fill=c_skin)
-        
-        meta = outfit["meta"]
-        items = outfit["items"]
-
-        # 2. Bottoms
-        # If skirt, draw specialized shape
-        pants_color = c_main # Monochromatic base usually looks good for bottoms
-        
-        if meta["is_skirt"]:
-            # Skirt shape
-            draw.polygon([
-                (180, 450), (320, 450), # Waist
-                (360, 650), (140, 650)  # Hem
-            ], fill=pants_color)
-            # Legs
-            draw.rectangle([210, 650, 240, 800], fill=c_skin)
-            draw.rectangle([260, 650, 290, 800], fill=c_skin)
-        else:
-            # Pants shape
-            draw.rectangle([180, 450, 320, 800], fill=pants_color)
-            # Gap between legs
-            draw.polygon([(245, 450), (255, 450), (255, 800), (245, 800)], fill=(250,250,250)) 
-
-        # 3. Inner Top
-        inner_color = c_accent
-        draw.rectangle([180, 180, 320, 460], fill=inner_color) # Torso
-        draw.rectangle([150, 180, 190, 350], fill=inner_color) # Left Arm base
-        draw.rectangle([310, 180, 350, 350], fill=inner_color) # Right Arm base
-        
-        # Hands
-        draw.ellipse([140, 340, 190, 390], fill=c_skin)
-        draw.ellipse([310, 340, 360, 390], fill=c_skin)
-
-        # 4. Outerwear (if creates)
-        if meta["has_outer"] and items["outer"]:
-            outer_color = c_main
-            # Open Jacket look
-            draw.rectangle([140, 170, 210, 480], fill=outer_color) # Left panel
-            draw.rectangle([290, 170, 360, 480], fill=outer_color) # Right panel
-            # Sleeves
-            draw.rectangle([120, 180, 170, 420], fill=outer_color)
-            draw.rectangle([330, 180, 380, 420], fill=outer_color)
-
-        # 5. Shoes
-        shoe_color = (30,30,30)
-        draw.rectangle([190, 800, 240, 850], fill=shoe_color)
-        draw.rectangle([260, 800, 310, 850], fill=shoe_color)
-
-        # Resize for better quality (Antialiasing hack)
-        return img.resize((250, 450), resample=Image.LANCZOS)
-
 # ==============================================================================
 # UI COMPONENTS
 # ==============================================================================
@@ -281,14 +90,14 @@ def sidebar_controls():
         # Simplify input using multiselect for primary genres instead of individual sliders
         genres = st.multiselect(
             "Favorite Styles (Select 1-3)", 
-            StyleConfig.GENRES, 
+            STYLE.genres, 
             default=["Casual", "Minimal"]
         )
         
         # Color Palette
         colors = st.multiselect(
             "Preferred Colors", 
-            StyleConfig.COLORS,
+            STYLE.colors,
             default=["Black", "Beige", "Navy"]
         )
         
@@ -298,8 +107,8 @@ def sidebar_controls():
             return {
                 "gender": gender,
                 "use_outer": use_outer,
-                "genres": genres if genres else StyleConfig.GENRES,
-                "colors": colors if colors else StyleConfig.COLORS,
+                "genres": genres if genres else STYLE.genres,
+                "colors": colors if colors else STYLE.colors,
                 "trigger": True
             }
             
@@ -310,6 +119,9 @@ def main():
     if "outfits" not in st.session_state:
         st.session_state["outfits"] = []
 
+    # Pre-render avatars (once per process, depending on AvatarRenderer.MODE)
+    AvatarRenderer.warm_up()
+
     # Title
     st.title("AI Personal Stylist")
     st.markdown("Your curated daily rotation based on your preferences.")
@@ -327,7 +139,8 @@ def main():
         for _ in range(3):
             g = random.choice(possible_genres)
             c = random.choice(possible_colors)
-            outfit = OutfitGenerator.create(g, c, config["gender"], config["use_outer"], possible_colors)
+            # Equal weights: the accent is drawn uniformly from the base color's pairings
+            outfit = OutfitGenerator.create(g, c, config["gender"], config["use_outer"], dict.fromkeys(STYLE.colors, 1))
             new_outfits.append(outfit)
             
         st.session_state["outfits"] = new_outfits
@@ -335,12 +148,13 @@ def main():
     # Display Gallery
     if st.session_state["outfits"]:
         cols = st.columns(3)
+        # Render the whole gallery up front (duplicates rendered once, PNG bytes cached)
+        images = AvatarRenderer.render_batch(st.session_state["outfits"], workers=4, encode=True)
         
-        for idx, (col, outfit) in enumerate(zip(cols, st.session_state["outfits"])):
+        for idx, (col, outfit, img) in enumerate(zip(cols, st.session_state["outfits"], images)):
             with col:
                 # Custom container style via markdown hack or just clean layout
-                img = AvatarRenderer.render(outfit)
-                st.image(img, use_container_width=True)
+                st.image(img.data, use_container_width=True)
                 
                 st.markdown(f"### {outfit['genre']}")
                 st.caption(f"{outfit['main_color']} & {outfit['accent_color']}")
@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from movie_data import convert_frame_snapshot, load_snapshot
+from movie_index import MovieIndex
+from movie_model import MFModel, masked_rmse, split_validation, top_k, train
+
+
+def synthetic_ratings(n, D, density=0.3, rank=4, seed=0, noise=0.0):
+    """ランク rank の因子から作った 1〜10 の評価行列（観測されないマスは NaN）。
+    noise を指定すると評価に正規分布の雑音を足す。
+    """
+    rng = np.random.default_rng(seed)
+    U = rng.normal(1, 0.25, (n, rank))
+    V = rng.normal(1, 0.25, (D, rank))
+    R = U @ V.T
+    R = 1 + 9 * (R - R.min()) / (R.max() - R.min())
+    if noise:
+        R = np.clip(R + rng.normal(0, noise, R.shape), 1, 10)
+    R[rng.random((n, D)) >= density] = np.nan
+    return R
+
+
+def stable_lr(R, lr=0.001):
+    """全件の勾配法は行列が大きいと発散するので、大きさに応じて学習率を下げる。"""
+    return min(lr, lr * 50 / max(R.shape))
+
+
+def epochs_per_second(R, engine, E, M=4, k=0.5):
+    lr = stable_lr(R)
+    start = time.perf_counter()
+    train(R, M, k, engine=engine, lr=lr, E=E, check_every=E)
+    return E / (time.perf_counter() - start)
+
+
+def bench_inplace(sizes, E):
+    """勾配法の通常版（gd）と確保なし版（gd_inplace）の 1秒あたりの反復回数を比べる。"""
+    print(f"{'n x D':>12} {'gd ep/s':>10} {'inplace ep/s':>13} {'speedup':>8}")
+    for n, D in sizes:
+        R = synthetic_ratings(n, D)
+        base = epochs_per_second(R, "gd", E)
+        fast = epochs_per_second(R, "gd_inplace", E)
+        print(f"{f'{n}x{D}':>12} {base:10.0f} {fast:13.0f} {fast / base:7.2f}x")
+
+
+def bench_ann(D, M, queries, k, nprobes, seed=0):
+    """近似索引（MovieIndex）の再現率と問い合わせ時間を総当たりと比べる。"""
+    rng = np.random.default_rng(seed)
+    # 平均 0 にして方向をばらけさせ、ノルムにもばらつきを持たせる（全部同じ向きだと簡単すぎる）
+    V = rng.normal(0, 1, (D, M)) * rng.lognormal(0, 0.3, (D, 1))
+    users = rng.normal(0, 1, (queries, M))
+
+    start = time.perf_counter()
+    truth = [set(top_k(V @ u, k)[0]) for u in users]
+    brute = (time.perf_counter() - start) / queries
+
+    start = time.perf_counter()
+    index = MovieIndex(V, seed=seed)
+    build = time.perf_counter() - start
+
+    print(f"D={D} M={M} nlist={len(index.centers)} build={build:.2f}s brute={brute * 1e3:.3f}ms/query")
+    print(f"{'nprobe':>7} {'recall@' + str(k):>10} {'ms/query':>9} {'speedup':>8}")
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        found = [set(index.query(u, k, nprobe=nprobe)[0]) for u in users]
+        latency = (time.perf_counter() - start) / queries
+        recall = np.mean([len(f & t) / k for f, t in zip(found, truth)])
+        print(f"{nprobe:>7} {recall:10.3f} {latency * 1e3:9.3f} {brute / latency:7.2f}x")
+
+
+# 各エンジンの設定（行列の大きさに応じて決める）
+SUITE_ENGINES = {
+    "gd": lambda R, epochs: {"lr": stable_lr(R), "E": epochs},
+    "gd_inplace": lambda R, epochs: {"lr": stable_lr(R), "E": epochs},
+    "gd_sparse": lambda R, epochs: {"lr": stable_lr(R), "E": epochs},
+    "als": lambda R, epochs: {"iters": 20},
+    "sgd": lambda R, epochs: {"lr": 0.005, "epochs": 10, "batch_size": 256},
+}
+
+
+def measure(fn, memory=True):
+    """fn() の (戻り値, 経過秒数, 最大メモリ使用量[バイト])。
+    tracemalloc を有効にすると遅くなるので、時間は追跡なしで測り、
+    メモリは memory=True のときだけもう一度追跡つきで実行して測る。
+    """
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if memory:
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench_suite(sizes, densities, ranks, engines, epochs, M=4, k=0.5, users=100, top=10, memory=True):
+    """大きさ・密度・ランクを変えた合成データで、読み込み・学習・当てはめ・上位k件の
+    時間と最大メモリ、学習/検証 RMSE を測る。結果は1ケース1行の辞書のリスト。
+    """
+    results = []
+    for (n, D), density, rank in ((s, d, r) for s in sizes for d in densities for r in ranks):
+        R = synthetic_ratings(n, D, density, rank, noise=0.5)
+        with tempfile.TemporaryDirectory() as tmp:
+            convert_frame_snapshot(pd.DataFrame(R), tmp)
+            loaded, load_s, load_peak = measure(lambda: load_snapshot(tmp).to_numpy(dtype=np.float64), memory)
+        R_train, R_valid = split_validation(loaded, 0.1)
+        # 当てはめ用の「新しいユーザー」は検証用に取り分けた評価を除いた行を使う
+        new_users = R_train[:users]
+        for engine in engines:
+            params = SUITE_ENGINES[engine](R_train, epochs)
+            (U, V, history), train_s, train_peak = measure(
+                lambda: train(R_train, M, k, engine=engine, **params), memory)
+            model = MFModel(U, V, range(D), k)
+            folded, fold_s, fold_peak = measure(lambda: model.fold_in_batch(new_users), memory)
+            _, topk_s, topk_peak = measure(
+                lambda: top_k(folded @ V.T, top, exclude=~np.isnan(new_users)), memory)
+            row = {
+                "n": n, "D": D, "density": density, "rank": rank, "engine": engine,
+                "M": M, "k": k, "params": params, "iterations": history[-1]["iter"] if history else 0,
+                "train_rmse": masked_rmse(R_train, U, V),
+                "valid_rmse": masked_rmse(R_valid, U, V),
+                "load_s": load_s, "train_s": train_s, "fold_in_s": fold_s, "top_k_s": topk_s,
+                "load_peak_bytes": load_peak, "train_peak_bytes": train_peak,
+                "fold_in_peak_bytes": fold_peak, "top_k_peak_bytes": topk_peak,
+            }
+            results.append(row)
+            peak = "" if train_peak is None else f" peak={train_peak / 2 ** 20:7.1f}MiB"
+            print(f"{n:>6}x{D:<6} d={density:<4} r={rank:<2} {engine:<10} "
+                  f"train={train_s:8.3f}s valid_rmse={row['valid_rmse']:.3f}{peak}")
+    return results
+
+
+def write_results(path, results):
+    """比較用に環境情報と一緒に JSON で保存する。"""
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    return path
+
+
+if __name__ == "__main__":
+    # 例: python bench_movie.py inplace --epochs 200
+    parser = argparse.ArgumentParser(description="映画推薦モデルのベンチマーク")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_inplace = sub.add_parser("inplace", help="gd と gd_inplace の速度比較")
+    p_inplace.add_argument("--epochs", type=int, default=200)
+    p_ann = sub.add_parser("ann", help="近似索引の再現率と速度")
+    p_ann.add_argument("--movies", type=int, default=100000)
+    p_ann.add_argument("-M", type=int, default=16)
+    p_ann.add_argument("--queries", type=int, default=200)
+    p_ann.add_argument("--top", type=int, default=10)
+    p_suite = sub.add_parser("suite", help="大きさ・密度・ランク・エンジンごとの総合計測")
+    p_suite.add_argument("--sizes", default="100x50,1000x500,3000x1000", help="n×D をカンマ区切りで")
+    p_suite.add_argument("--densities", default="0.05,0.3")
+    p_suite.add_argument("--ranks", default="4")
+    p_suite.add_argument("--engines", default=",".join(SUITE_ENGINES))
+    p_suite.add_argument("--epochs", type=int, default=200, help="勾配法の反復回数")
+    p_suite.add_argument("--no-memory", action="store_true", help="メモリ計測（2回目の実行）を省く")
+    p_suite.add_argument("--out", default="bench_movie.json")
+    args = parser.parse_args()
+
+    if args.command == "inplace":
+        bench_inplace([(20, 10), (100, 50), (500, 200), (2000, 1000)], args.epochs)
+    elif args.command == "ann":
+        bench_ann(args.movies, args.M, args.queries, args.top, [1, 2, 4, 8, 16, 32])
+    elif args.command == "suite":
+        sizes = [tuple(int(x) for x in size.split("x")) for size in args.sizes.split(",")]
+        results = bench_suite(
+            sizes,
+            [float(d) for d in args.densities.split(",")],
+            [int(r) for r in args.ranks.split(",")],
+            args.engines.split(","),
+            args.epochs,
+            memory=not args.no_memory,
+        )
+        print(write_results(args.out, results))
@@ -0,0 +1,295 @@
+import argparse
+import json
+import os
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+# 評価データの既定の取得元（環境変数 MOVIE_RATE_PATH でローカルファイル/ミラーを指定できる）
+DEFAULT_URL = "https://github.com/aimathstats/dataviz1/raw/refs/heads/main/data/movie_rate.xlsx"
+SOURCE_ENV = "MOVIE_RATE_PATH"
+
+# プロセス内キャッシュ: (取得元, 更新時刻, サイズ) -> DataFrame
+# Streamlit はスクリプトを毎回再実行するが、import したモジュールは保持されるのでここに置く
+_cache = {}
+
+
+def resolve_source(source=None):
+    """読み込み先を決める。指定なしなら環境変数、それもなければ既定URL。"""
+    if source is None:
+        source = os.environ.get(SOURCE_ENV) or DEFAULT_URL
+    return source
+
+
+def source_key(source):
+    """キャッシュのキー。ローカルファイルは更新時刻とサイズで版を区別する。"""
+    if is_snapshot(source):
+        # 変換のたびに meta.json が差し替わるので、その版で区別する
+        stat = os.stat(os.path.join(source, SNAPSHOT_META))
+        return (os.path.abspath(source), stat.st_mtime_ns, stat.st_size)
+    if os.path.exists(source):
+        stat = os.stat(source)
+        return (os.path.abspath(source), stat.st_mtime_ns, stat.st_size)
+    return (source, None, None)
+
+
+def download_mirror(path, url=DEFAULT_URL):
+    """URL のファイルをローカルに保存しておく（デプロイ時に一度だけ実行する想定）。"""
+    tmp = path + ".tmp"
+    urllib.request.urlretrieve(url, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+# スナップショット（ディレクトリ）の中身
+SNAPSHOT_VALUES = "values.npy"  # float32 の評価値（未評価は NaN）
+SNAPSHOT_MASK = "mask.npy"      # 評価済みかどうか（bool）
+SNAPSHOT_META = "meta.json"     # 列名（映画）と行のインデックス、今の版のファイル名
+# 実際のファイル名は版ごとに values-<版>.npy / mask-<版>.npy。上の2つは古い形式の名前
+
+
+def is_snapshot(source):
+    return os.path.isdir(source) and os.path.exists(os.path.join(source, SNAPSHOT_META))
+
+
+def convert_snapshot(source, out_dir):
+    """Excel の評価表をバイナリのスナップショットに変換する（オフラインで一度だけ実行）。"""
+    return convert_frame_snapshot(pd.read_excel(resolve_source(source)), out_dir)
+
+
+def _read_snapshot_meta(path):
+    with open(os.path.join(path, SNAPSHOT_META), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _snapshot_files(meta):
+    """meta が指す (評価値, マスク) のファイル名。古い形式なら固定の名前。"""
+    return meta.get("values", SNAPSHOT_VALUES), meta.get("mask", SNAPSHOT_MASK)
+
+
+def convert_frame_snapshot(df, out_dir):
+    """読み込み済みの評価表（DataFrame）をスナップショットとして書き出す。
+    動いているアプリが古い版をメモリマップしていても壊さないよう、既存のファイルは上書きしない。
+    新しい版は別名のファイルに書き、最後に meta.json を os.replace で差し替えて一度に切り替える。
+    """
+    values = df.to_numpy(dtype=np.float32)
+    os.makedirs(out_dir, exist_ok=True)
+    previous = _read_snapshot_meta(out_dir) if is_snapshot(out_dir) else None
+    version = time.time_ns()
+    values_name, mask_name = f"values-{version}.npy", f"mask-{version}.npy"
+    np.save(os.path.join(out_dir, values_name), values)
+    np.save(os.path.join(out_dir, mask_name), ~np.isnan(values))
+    meta = {
+        "columns": [str(c) for c in df.columns],
+        "index": df.index.tolist(),
+        "shape": list(values.shape),
+        "values": values_name,
+        "mask": mask_name,
+    }
+    tmp = os.path.join(out_dir, SNAPSHOT_META + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(out_dir, SNAPSHOT_META))
+
+    # 切り替え直前に meta.json を読んだ読み手のために1つ前の版は残し、それより古い版を消す。
+    # 消してもメモリマップ済みの読み手はそのまま読める（inode はマップが外れるまで残る）
+    keep = {values_name, mask_name}
+    if previous is not None:
+        keep.update(_snapshot_files(previous))
+    for name in os.listdir(out_dir):
+        if name.startswith(("values", "mask")) and name.endswith(".npy") and name not in keep:
+            os.remove(os.path.join(out_dir, name))
+    return out_dir
+
+
+def load_snapshot(path):
+    """スナップショットをメモリマップで開く。複数プロセスでページキャッシュを共有できる。"""
+    meta = _read_snapshot_meta(path)
+    values = np.load(os.path.join(path, _snapshot_files(meta)[0]), mmap_mode="r")
+    # コピーせずにメモリマップをそのまま包む（読み取り専用）
+    return pd.DataFrame(values, index=meta["index"], columns=meta["columns"], copy=False)
+
+
+def load_mask(path):
+    return np.load(os.path.join(path, _snapshot_files(_read_snapshot_meta(path))[1]), mmap_mode="r")
+
+
+def load_ratings(source=None):
+    """評価行列を読み込む。同じ版のファイルは一度しかパースしない。
+    source がスナップショットのディレクトリなら Excel ではなくそちらをメモリマップする。
+    """
+    source = resolve_source(source)
+    key = source_key(source)
+    if key not in _cache:
+        # 同じ取得元の古い版は捨てる
+        for old in [k for k in _cache if k[0] == key[0]]:
+            del _cache[old]
+        if is_snapshot(source):
+            _cache[key] = load_snapshot(source)
+        else:
+            _cache[key] = pd.read_excel(source)
+    return _cache[key]
+
+
+def clear_cache():
+    _cache.clear()
+
+
+class RatingTriples:
+    """観測された評価だけを (ユーザー, 映画, 評価) の3つ組で持つ（COO 形式）。
+    密な NaN 行列と違い、メモリと計算量が評価の件数に比例する。
+    """
+
+    def __init__(self, rows, cols, vals, shape):
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.cols = np.asarray(cols, dtype=np.int64)
+        self.vals = np.asarray(vals, dtype=np.float64)
+        self.shape = tuple(shape)
+        self._csr = None
+
+    @classmethod
+    def from_dense(cls, R):
+        R = np.asarray(R, dtype=np.float64)
+        rows, cols = np.nonzero(~np.isnan(R))
+        return cls(rows, cols, R[rows, cols], R.shape)
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls.from_dense(df.to_numpy(dtype=np.float64))
+
+    def __len__(self):
+        return len(self.vals)
+
+    def transpose(self):
+        return RatingTriples(self.cols, self.rows, self.vals, self.shape[::-1])
+
+    def by_row(self):
+        """行ごとにまとめた形（CSR）: (indptr, 列番号, 評価)。行 i は indptr[i]:indptr[i+1]。"""
+        if self._csr is None:
+            order = np.argsort(self.rows, kind="stable")
+            counts = np.bincount(self.rows, minlength=self.shape[0])
+            indptr = np.concatenate([[0], np.cumsum(counts)])
+            self._csr = (indptr, self.cols[order], self.vals[order])
+        return self._csr
+
+    def to_dense(self):
+        R = np.full(self.shape, np.nan)
+        R[self.rows, self.cols] = self.vals
+        return R
+
+    def chunks(self, chunk_size, shuffle=True, seed=None):
+        """(行, 列, 評価) を chunk_size 件ずつ返す。TripleStore.chunks と同じ形。"""
+        order = np.random.default_rng(seed).permutation(len(self)) if shuffle else np.arange(len(self))
+        for start in range(0, len(self), chunk_size):
+            part = order[start:start + chunk_size]
+            yield self.rows[part], self.cols[part], self.vals[part]
+
+
+# 3つ組の保存形式（ディレクトリ）: 型を固定した生のバイナリ + meta.json
+STORE_DTYPES = {"rows": np.int64, "cols": np.int64, "vals": np.float32}
+
+
+class TripleStore:
+    """ディスク上に置いた評価の3つ組。メモリに載らない件数でも chunks で少しずつ読める。"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, SNAPSHOT_META), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.shape = tuple(self.meta["shape"])
+        self.count = self.meta["count"]
+        self.arrays = {
+            name: np.memmap(os.path.join(path, name + ".bin"), dtype=dtype, mode="r", shape=(self.count,))
+            if self.count else np.empty(0, dtype=dtype)
+            for name, dtype in STORE_DTYPES.items()
+        }
+
+    def __len__(self):
+        return self.count
+
+    def chunks(self, chunk_size, shuffle=True, seed=None):
+        """chunk_size 件ずつ (行, 列, 評価) を読み出す。
+        shuffle なら読む順番をチャンク単位で入れ替え、チャンクの中も並べ替える。
+        """
+        rng = np.random.default_rng(seed)
+        starts = np.arange(0, self.count, chunk_size)
+        if shuffle:
+            starts = rng.permutation(starts)
+        for start in starts:
+            rows, cols, vals = (np.array(self.arrays[name][start:start + chunk_size]) for name in STORE_DTYPES)
+            if shuffle:
+                order = rng.permutation(len(vals))
+                rows, cols, vals = rows[order], cols[order], vals[order]
+            yield rows, cols, vals.astype(np.float64)
+
+
+def _write_parts(path, parts):
+    """(行, 列, 評価) のチャンクを順に追記する。書いた件数を返す。"""
+    os.makedirs(path, exist_ok=True)
+    files = {name: open(os.path.join(path, name + ".bin"), "wb") for name in STORE_DTYPES}
+    count = 0
+    try:
+        for rows, cols, vals in parts:
+            for name, arr in zip(STORE_DTYPES, (rows, cols, vals)):
+                files[name].write(np.asarray(arr, dtype=STORE_DTYPES[name]).tobytes())
+            count += len(vals)
+    finally:
+        for f in files.values():
+            f.close()
+    return count
+
+
+def _write_store_meta(path, shape, count, users=None, movies=None):
+    meta = {"shape": list(shape), "count": count, "users": users, "movies": movies}
+    with open(os.path.join(path, SNAPSHOT_META), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+def write_store(path, parts, shape, users=None, movies=None):
+    """(行, 列, 評価) のチャンクの列から TripleStore を作る。"""
+    count = _write_parts(path, parts)
+    _write_store_meta(path, shape, count, users, movies)
+    return TripleStore(path)
+
+
+def csv_to_store(csv_path, path, user_col="user", movie_col="movie", rating_col="rating", chunksize=1_000_000):
+    """(ユーザー, 映画, 評価) の縦長 CSV を少しずつ読んで TripleStore に変換する。
+    ユーザーと映画の ID は出てきた順に 0, 1, 2, ... の番号を振る。
+    """
+    users, movies = {}, {}
+
+    def parts():
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            rows = np.array([users.setdefault(u, len(users)) for u in chunk[user_col]], dtype=np.int64)
+            cols = np.array([movies.setdefault(m, len(movies)) for m in chunk[movie_col]], dtype=np.int64)
+            yield rows, cols, chunk[rating_col].to_numpy(dtype=np.float32)
+
+    count = _write_parts(path, parts())
+    # 全部読み終わって初めて大きさと ID の対応が決まる
+    _write_store_meta(path, (len(users), len(movies)), count, [str(u) for u in users], [str(m) for m in movies])
+    return TripleStore(path)
+
+
+if __name__ == "__main__":
+    # 例: python movie_data.py convert movie_rate.xlsx movie_snapshot
+    parser = argparse.ArgumentParser(description="映画評価データの変換")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_conv = sub.add_parser("convert", help="Excel をスナップショットに変換")
+    p_conv.add_argument("source", nargs="?", default=None)
+    p_conv.add_argument("out_dir")
+    p_mirror = sub.add_parser("mirror", help="URL の Excel をローカルに保存")
+    p_mirror.add_argument("path")
+    p_store = sub.add_parser("store", help="縦長 CSV（user,movie,rating）を3つ組のストアに変換")
+    p_store.add_argument("csv")
+    p_store.add_argument("out_dir")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        print(convert_snapshot(args.source, args.out_dir))
+    elif args.command == "store":
+        store = csv_to_store(args.csv, args.out_dir)
+        print(f"{args.out_dir}: {len(store)} ratings, shape {store.shape}")
+    else:
+        print(download_mirror(args.path))
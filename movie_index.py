@@ -0,0 +1,78 @@
+import weakref
+
+import numpy as np
+
+from movie_model import top_k
+
+# 学習済みモデルごとに一度だけ作った索引（モデルが捨てられたら索引も消える）
+_indexes = weakref.WeakKeyDictionary()
+
+
+def mips_transform(V):
+    """内積最大（MIPS）をコサイン類似度の最大に置き換えるため、映画ベクトルに1次元足す。
+    x -> [x, sqrt(Φ² - |x|²)] とすると全ベクトルのノルムが Φ にそろい、
+    クエリ [q, 0] との内積の順位は元の内積 q·x の順位と一致する。
+    """
+    norms = np.linalg.norm(V, axis=1)
+    phi = norms.max() if len(norms) else 0.0
+    extra = np.sqrt(np.maximum(phi ** 2 - norms ** 2, 0.0))
+    return np.hstack([V, extra[:, None]])
+
+
+def kmeans(X, n_clusters, iters=20, seed=0):
+    """素朴な k-means（Lloyd 法）。(中心, 各点の所属) を返す。"""
+    rng = np.random.default_rng(seed)
+    centers = X[rng.choice(len(X), n_clusters, replace=False)].copy()
+    for _ in range(iters):
+        # |x - c|² = |x|² - 2x·c + |c|² のうち x ごとに定数の項は省く
+        dist = (centers ** 2).sum(axis=1) - 2 * X @ centers.T
+        labels = dist.argmin(axis=1)
+        for c in range(n_clusters):
+            members = X[labels == c]
+            if len(members):
+                centers[c] = members.mean(axis=0)
+    return centers, labels
+
+
+class MovieIndex:
+    """映画の因子ベクトル V に対する近似最近傍（IVF）索引。
+    MIPS 変換したベクトルを k-means で nlist 個のグループに分け、問い合わせでは
+    ユーザーベクトルに近い nprobe 個のグループの映画だけを正確な内積で順位付けする。
+    """
+
+    def __init__(self, V, nlist=None, nprobe=4, seed=0):
+        self.V = np.asarray(V, dtype=np.float64)
+        D = len(self.V)
+        if nlist is None:
+            nlist = max(1, int(np.sqrt(D)))
+        nlist = min(nlist, D)
+        self.nprobe = nprobe
+        X = mips_transform(self.V)
+        self.centers, labels = kmeans(X, nlist, seed=seed)
+        # グループごとの映画番号（CSR 形式）
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=nlist)
+        self.indptr = np.concatenate([[0], np.cumsum(counts)])
+        self.members = order
+
+    def candidates(self, u, nprobe=None):
+        """ユーザーベクトル u に近いグループに属する映画番号。"""
+        nprobe = min(nprobe or self.nprobe, len(self.centers))
+        # クエリ [u, 0] と中心の内積（余分な次元は 0 なので最後の列は使わない）
+        lists, _ = top_k(self.centers[:, :-1] @ u, nprobe)
+        return np.concatenate([self.members[self.indptr[c]:self.indptr[c + 1]] for c in lists])
+
+    def query(self, u, k, exclude=None, nprobe=None):
+        """内積 u·v の大きい映画を k 本（近似）。exclude は映画ごとの bool（評価済みなど）。"""
+        cand = self.candidates(u, nprobe)
+        scores = self.V[cand] @ u
+        excl = None if exclude is None else np.asarray(exclude, dtype=bool)[cand]
+        pos, vals = top_k(scores, k, exclude=excl)
+        return cand[pos], vals
+
+
+def index_for(model, **params):
+    """学習済みモデルの索引を返す。同じモデルには一度しか作らない。"""
+    if model not in _indexes:
+        _indexes[model] = MovieIndex(model.V, **params)
+    return _indexes[model]
@@ -0,0 +1,541 @@
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from movie_data import RatingTriples, TripleStore, load_ratings
+
+# 学習済みモデルのプロセス内キャッシュ: (データの指紋, ハイパーパラメータ) -> MFModel
+_models = {}
+
+
+def fingerprint(ratings):
+    """評価表の中身（値と映画名）から指紋を作る。表が変われば別モデルになる。"""
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(ratings.to_numpy(dtype=np.float64)).tobytes())
+    h.update("\0".join(map(str, ratings.columns)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def masked_rmse(R, U, V):
+    """観測されたマスの RMSE。R は NaN 入りの密行列か RatingTriples。"""
+    if isinstance(R, RatingTriples):
+        err = _triple_error(R, U, V)
+    else:
+        observed = ~np.isnan(R)
+        err = (R - U @ V.T)[observed]
+    if len(err) == 0:
+        return float("nan")
+    return float(np.sqrt(np.mean(err ** 2)))
+
+
+def _triple_error(T, U, V):
+    """観測された評価ごとの誤差 r - u·v。"""
+    return T.vals - np.einsum("ij,ij->i", U[T.rows], V[T.cols])
+
+
+def _scatter_rows(idx, W, n):
+    """W の各行を idx の行に足し込む（np.add.at より速い bincount 版）。"""
+    out = np.empty((n, W.shape[1]))
+    for m in range(W.shape[1]):
+        out[:, m] = np.bincount(idx, weights=W[:, m], minlength=n)
+    return out
+
+
+def split_validation(R, frac=0.1, seed=0):
+    """観測値の一部を検証用に取り分ける。(学習用 R, 検証用 R) を返す（使わないマスは NaN）。"""
+    rng = np.random.default_rng(seed)
+    observed = ~np.isnan(R)
+    held = observed & (rng.random(R.shape) < frac)
+    R_train = np.where(held, np.nan, R)
+    R_valid = np.where(held, R, np.nan)
+    return R_train, R_valid
+
+
+def _monitor(history, it, R, U, V, R_valid, tol):
+    """学習曲線に1点追加し、改善が tol 未満になったら True（打ち切り）を返す。
+    検証データがあれば検証 RMSE で、なければ学習 RMSE で判定する。
+    """
+    point = {"iter": it, "train_rmse": masked_rmse(R, U, V)}
+    if R_valid is not None:
+        point["valid_rmse"] = masked_rmse(R_valid, U, V)
+    history.append(point)
+    if tol is None or len(history) < 2:
+        return False
+    metric = "valid_rmse" if R_valid is not None else "train_rmse"
+    return history[-2][metric] - history[-1][metric] < tol
+
+
+def _init_factors(rng, n, D, M, init=None):
+    """因子行列の初期値。init=(U, V) があればそこから始め（ウォームスタート）、なければ乱数。"""
+    if init is not None:
+        U, V = init
+        return np.array(U, dtype=np.float64), np.array(V, dtype=np.float64)
+    return rng.normal(1, 0.25, (n, M)), rng.normal(1, 0.25, (D, M))
+
+
+def train_gd(R, M, k, lr, E, seed=0, tol=None, check_every=100, R_valid=None, init=None):
+    """行列分解を勾配法で学習する（R は未評価が NaN の n×D 行列）。
+    check_every 回ごとに RMSE を記録し、tol を指定すると改善が止まった時点で打ち切る。
+    (U, V, 学習曲線) を返す。
+    """
+    rng = np.random.default_rng(seed)
+    n, D = R.shape
+    U, V = _init_factors(rng, n, D, M, init)
+    missing = np.isnan(R)
+    history = []
+    for it in range(1, E + 1):
+        error = R - np.dot(U, V.T)
+        error[missing] = 0
+        gradU = 2 * np.dot(error, V) - 2 * k * U
+        gradV = 2 * np.dot(error.T, U) - 2 * k * V
+        U += lr * gradU
+        V += lr * gradV
+        if it % check_every == 0 or it == E:
+            if _monitor(history, it, R, U, V, R_valid, tol):
+                break
+    return U, V, history
+
+
+def train_gd_inplace(R, M, k, lr, E, seed=0, tol=None, check_every=100, R_valid=None, init=None):
+    """train_gd と同じ計算を、作業用の配列を最初に確保して使い回しながら行う。
+    ループ内では out= 付きの numpy 演算だけを使うので、毎反復のメモリ確保が起きない。
+    """
+    rng = np.random.default_rng(seed)
+    n, D = R.shape
+    U, V = _init_factors(rng, n, D, M, init)
+    # マスクと欠損を0にした評価は一度だけ作る
+    observed = (~np.isnan(R)).astype(np.float64)
+    R0 = np.nan_to_num(R, nan=0.0)
+    error = np.empty((n, D))
+    gradU = np.empty((n, M))
+    gradV = np.empty((D, M))
+    decay = 1 - 2 * lr * k  # U += lr*(2*error@V - 2*k*U) を U = decay*U + 2*lr*(error@V) と書き換え
+    history = []
+    for it in range(1, E + 1):
+        np.dot(U, V.T, out=error)
+        np.subtract(R0, error, out=error)
+        np.multiply(error, observed, out=error)
+        np.dot(error, V, out=gradU)
+        np.dot(error.T, U, out=gradV)
+        gradU *= 2 * lr
+        gradV *= 2 * lr
+        U *= decay
+        V *= decay
+        U += gradU
+        V += gradV
+        if it % check_every == 0 or it == E:
+            if _monitor(history, it, R, U, V, R_valid, tol):
+                break
+    return U, V, history
+
+
+def train_gd_sparse(R, M, k, lr, E, seed=0, tol=None, check_every=100, R_valid=None, init=None):
+    """train_gd と同じ勾配法を、観測された評価（3つ組）だけで計算する。
+    1反復の計算量が n×D ではなく評価の件数に比例するので、疎な大きい表でも使える。
+    R は密行列でも RatingTriples でもよい。
+    """
+    T = R if isinstance(R, RatingTriples) else RatingTriples.from_dense(R)
+    rng = np.random.default_rng(seed)
+    n, D = T.shape
+    U, V = _init_factors(rng, n, D, M, init)
+    history = []
+    for it in range(1, E + 1):
+        err = _triple_error(T, U, V)[:, None]
+        gradU = 2 * _scatter_rows(T.rows, err * V[T.cols], n) - 2 * k * U
+        gradV = 2 * _scatter_rows(T.cols, err * U[T.rows], D) - 2 * k * V
+        U += lr * gradU
+        V += lr * gradV
+        if it % check_every == 0 or it == E:
+            if _monitor(history, it, T, U, V, R_valid, tol):
+                break
+    return U, V, history
+
+
+def train_sgd(R, M, k, lr=0.01, epochs=20, batch_size=1024, decay=0.0, seed=0, tol=None,
+              R_valid=None, chunk_size=1_000_000, init=None):
+    """シャッフルした評価の小さなまとまり（ミニバッチ）ごとに更新する確率的勾配法。
+    R は密行列・RatingTriples・TripleStore のどれでもよく、TripleStore なら
+    chunk_size 件ずつディスクから読むので、メモリに載らない件数でも学習できる。
+    学習率はエポックごとに lr / (1 + decay × エポック) で下げる。
+    学習曲線の train_rmse は、各エポック中に更新前の予測で測った誤差。
+    """
+    if not isinstance(R, (RatingTriples, TripleStore)):
+        R = RatingTriples.from_dense(R)
+    rng = np.random.default_rng(seed)
+    n, D = R.shape
+    U, V = _init_factors(rng, n, D, M, init)
+    history = []
+    for epoch in range(1, epochs + 1):
+        step = lr / (1 + decay * (epoch - 1))
+        sq_err, count = 0.0, 0
+        for rows, cols, vals in R.chunks(chunk_size, seed=rng.integers(1 << 31)):
+            for start in range(0, len(vals), batch_size):
+                r, c = rows[start:start + batch_size], cols[start:start + batch_size]
+                Ur, Vc = U[r], V[c]
+                err = vals[start:start + batch_size] - np.einsum("ij,ij->i", Ur, Vc)
+                sq_err += float(err @ err)
+                count += len(err)
+                # 同じユーザー/映画がバッチ内に複数あってもよいように足し込みで更新する
+                dU = err[:, None] * Vc - k * Ur
+                dV = err[:, None] * Ur - k * Vc
+                np.add.at(U, r, step * dU)
+                np.add.at(V, c, step * dV)
+        point = {"iter": epoch, "train_rmse": float(np.sqrt(sq_err / max(count, 1)))}
+        if R_valid is not None:
+            point["valid_rmse"] = masked_rmse(R_valid, U, V)
+        history.append(point)
+        if tol is not None and len(history) >= 2:
+            metric = "valid_rmse" if R_valid is not None else "train_rmse"
+            if history[-2][metric] - history[-1][metric] < tol:
+                break
+    return U, V, history
+
+
+def _ridge_rows(T, F, k):
+    """T の各行について、観測された列だけで F を固定したリッジ回帰を解く。"""
+    indptr, cols, vals = T.by_row()
+    M = F.shape[1]
+    out = np.zeros((T.shape[0], M))
+    reg = k * np.eye(M)
+    for i in range(T.shape[0]):
+        lo, hi = indptr[i], indptr[i + 1]
+        if hi > lo:
+            Fo = F[cols[lo:hi]]
+            out[i] = np.linalg.solve(Fo.T @ Fo + reg, Fo.T @ vals[lo:hi])
+    return out
+
+
+def train_als(R, M, k, iters=30, seed=0, tol=None, R_valid=None, init=None):
+    """交互最小二乗法: V を固定して U を、U を固定して V を、観測値だけで解き直す。
+    目的関数は train_gd と同じ（二乗誤差 + k×ノルム）で、数十回程度で収束する。
+    観測値は3つ組で持つので、R は密行列でも RatingTriples でもよい。
+    """
+    T = R if isinstance(R, RatingTriples) else RatingTriples.from_dense(R)
+    Tt = T.transpose()
+    rng = np.random.default_rng(seed)
+    n, D = T.shape
+    # ALS は V から解き始めるので、ウォームスタートでも U の初期値は使わない
+    V = np.array(init[1], dtype=np.float64) if init is not None else rng.normal(1, 0.25, (D, M))
+    history = []
+    for it in range(1, iters + 1):
+        U = _ridge_rows(T, V, k)
+        V = _ridge_rows(Tt, U, k)
+        if _monitor(history, it, T, U, V, R_valid, tol):
+            break
+    return U, V, history
+
+
+# 学習エンジン（名前 -> 関数）。どれも (R, M, k, ..., seed, tol, R_valid, init) を受け取り
+# (U, V, 学習曲線) を返す
+ENGINES = {
+    "gd": train_gd,
+    "gd_inplace": train_gd_inplace,
+    "gd_sparse": train_gd_sparse,
+    "als": train_als,
+    "sgd": train_sgd,
+}
+
+# エンジンごとの既定の設定（recommend コマンド用。エンジンによって受け取る引数が違う）
+ENGINE_DEFAULTS = {
+    "gd": {"lr": 0.001, "E": 20000, "tol": 1e-4},
+    "gd_inplace": {"lr": 0.001, "E": 20000, "tol": 1e-4},
+    "gd_sparse": {"lr": 0.001, "E": 20000, "tol": 1e-4},
+    "als": {"iters": 30, "tol": 1e-4},
+    "sgd": {"lr": 0.01, "epochs": 20, "batch_size": 1024, "tol": 1e-4},
+}
+
+
+def train(R, M, k, engine="gd", seed=0, **params):
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine: {engine} (choose from {', '.join(ENGINES)})")
+    return ENGINES[engine](R, M, k, seed=seed, **params)
+
+
+def top_k(scores, k, exclude=None):
+    """scores の大きい順に k 個の (位置, 値) を返す。全体を並べ替えず argpartition で選ぶ。
+    exclude（scores と同じ形の bool）が True の位置は選ばない。2次元なら行ごとに選び、
+    候補が k 個に満たない行は値が -inf の穴埋めになる（1次元なら切り詰める）。
+    """
+    scores = np.array(scores, dtype=np.float64)
+    if exclude is not None:
+        scores[np.asarray(exclude, dtype=bool)] = -np.inf
+    single = scores.ndim == 1
+    if single:
+        scores = scores[None, :]
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        idx = np.empty((len(scores), 0), dtype=np.int64)
+        vals = np.empty((len(scores), 0))
+    else:
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        vals = np.take_along_axis(scores, idx, axis=1)
+        order = np.argsort(-vals, axis=1, kind="stable")
+        idx = np.take_along_axis(idx, order, axis=1)
+        vals = np.take_along_axis(vals, order, axis=1)
+    if single:
+        keep = np.isfinite(vals[0])
+        return idx[0][keep], vals[0][keep]
+    return idx, vals
+
+
+def _train_candidate(job):
+    """train_best の1候補（別プロセスで実行される）。検証 RMSE を返す。"""
+    R_train, R_valid, M, k, engine, seed, params = job
+    U, V, _ = train(R_train, M, k, engine=engine, seed=seed, R_valid=R_valid, **params)
+    return masked_rmse(R_valid, U, V)
+
+
+# 探索全体（評価表のマス数 × 候補数）がこれより小さければ、プロセスを起こすより順に学習する方が速い
+POOL_MIN_CELLS = 1_000_000
+# fork はスレッドの動いているプロセス（Streamlit のサーバーや ModelService）では固まることがあるので使わない
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def train_best(R, Ms, ks, seeds, engine="als", valid_frac=0.1, processes=None, **params):
+    """因子数 M・正則化 k・乱数の種の組み合わせをプロセスプールで並列に学習し、
+    検証 RMSE が最も小さい組み合わせを選ぶ。選んだ設定で全データを学習し直して返す。
+    (M, k, seed, U, V, 学習曲線, 候補ごとの結果) を返す。
+    processes=None なら小さな探索（POOL_MIN_CELLS 未満）はプールを使わずにその場で学習する。
+    """
+    R_train, R_valid = split_validation(R, valid_frac)
+    combos = list(itertools.product(Ms, ks, seeds))
+    jobs = [(R_train, R_valid, M, k, engine, seed, params) for M, k, seed in combos]
+    small = processes is None and R.size * len(jobs) < POOL_MIN_CELLS
+    if small or processes == 1 or len(jobs) == 1:
+        errors = [_train_candidate(job) for job in jobs]
+    else:
+        workers = min(processes or os.cpu_count() or 1, len(jobs))
+        context = multiprocessing.get_context(POOL_START_METHOD)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            errors = list(pool.map(_train_candidate, jobs))
+    results = [
+        {"M": M, "k": k, "seed": seed, "valid_rmse": err}
+        for (M, k, seed), err in zip(combos, errors)
+    ]
+    best = min(results, key=lambda r: r["valid_rmse"])
+    U, V, history = train(R, best["M"], best["k"], engine=engine, seed=best["seed"], **params)
+    return best["M"], best["k"], best["seed"], U, V, history, results
+
+
+class MFModel:
+    """学習済みの因子行列 U（ユーザー）と V（映画）。"""
+
+    def __init__(self, U, V, columns, k, history=None, index=None, params=None, data_fingerprint=None):
+        self.U = U
+        self.V = V
+        self.columns = list(columns)
+        self.k = k
+        self.history = history or []  # 学習曲線（[{"iter", "train_rmse", ("valid_rmse")}, ...]）
+        self.index = list(index) if index is not None else list(range(len(U)))  # U の各行のユーザー
+        self.params = params or {}  # 学習の設定（M, k, engine, seed など）
+        self.data_fingerprint = data_fingerprint  # 学習に使った評価表の指紋
+
+    def save(self, path):
+        """因子行列とメタデータを1つの .npz に保存する。
+        一時ファイルに書いてから置き換えるので、読む側が書きかけのファイルを見ることはない。
+        一時ファイルは書き手ごとに別の名前なので、複数のプロセスやスレッドが同時に保存しても壊れない。
+        """
+        meta = {
+            "columns": self.columns,
+            "index": self.index,
+            "k": self.k,
+            "history": self.history,
+            "params": self.params,
+            "fingerprint": self.data_fingerprint,
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp.npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, U=self.U, V=self.V, meta=np.array(json.dumps(meta, ensure_ascii=False)))
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls(data["U"], data["V"], meta["columns"], meta["k"], meta["history"],
+                       meta["index"], meta["params"], meta["fingerprint"])
+
+    def warm_start(self, ratings):
+        """更新された評価表を学習し直すときの初期値 (U, V)。
+        残っている映画・ユーザーは前回の因子を引き継ぎ、新しい映画は乱数、
+        新しいユーザーは前回のモデルに当てはめた値から始める。
+        """
+        rng = np.random.default_rng(0)
+        M = self.V.shape[1]
+        V0 = rng.normal(1, 0.25, (len(ratings.columns), M))
+        old_cols = {c: j for j, c in enumerate(self.columns)}
+        for j, c in enumerate(ratings.columns):
+            if c in old_cols:
+                V0[j] = self.V[old_cols[c]]
+        U0 = self.fold_in_batch(ratings.reindex(columns=self.columns).to_numpy(dtype=np.float64))
+        old_rows = {r: i for i, r in enumerate(self.index)}
+        for i, r in enumerate(ratings.index):
+            if r in old_rows:
+                U0[i] = self.U[old_rows[r]]
+        return U0, V0
+
+    def fold_in(self, user_row):
+        """V を固定したまま、新しいユーザーの因子ベクトルだけをリッジ回帰で求める。
+        min_u Σ(r_j - u·v_j)^2 + k|u|^2  →  u = (V_rᵀV_r + kI)⁻¹ V_rᵀ r
+        """
+        user_row = np.asarray(user_row, dtype=np.float64)
+        rated = ~np.isnan(user_row)
+        if not rated.any():
+            # 一つも評価がなければ既存ユーザーの平均で代用する
+            return self.U.mean(axis=0)
+        Vr = self.V[rated]
+        A = Vr.T @ Vr + self.k * np.eye(self.V.shape[1])
+        return np.linalg.solve(A, Vr.T @ user_row[rated])
+
+    def predict(self, user_row):
+        """新しいユーザーの全映画に対する予測評価。"""
+        return self.V @ self.fold_in(user_row)
+
+    def fold_in_batch(self, R):
+        """fold_in を多数のユーザー（R の各行、未評価は NaN）に対してまとめて行う。
+        ユーザーごとの M×M の連立方程式を積み重ねて一度に解く。
+        """
+        R = np.asarray(R, dtype=np.float64)
+        observed = ~np.isnan(R)
+        M = self.V.shape[1]
+        # A_i = Σ_j mask_ij v_j v_jᵀ + kI を (N, M, M) でまとめて作る
+        VV = (self.V[:, :, None] * self.V[:, None, :]).reshape(len(self.V), M * M)
+        A = (observed @ VV).reshape(-1, M, M) + self.k * np.eye(M)
+        b = np.where(observed, R, 0.0) @ self.V
+        users = np.linalg.solve(A, b[:, :, None])[:, :, 0]
+        # 一つも評価がないユーザーは既存ユーザーの平均で代用する
+        users[~observed.any(axis=1)] = self.U.mean(axis=0)
+        return users
+
+    def recommend_batch(self, ratings, n=3):
+        """複数ユーザーの未評価映画から予測評価の高い順に n 本ずつ選ぶ。
+        ratings は映画を列に持つ DataFrame（列は self.columns に合わせる）。
+        (ユーザー, 順位, 映画, 予測評価) の縦長の DataFrame を返す。
+        """
+        R = ratings.reindex(columns=self.columns).to_numpy(dtype=np.float64)
+        scores = self.fold_in_batch(R) @ self.V.T
+        top, top_scores = top_k(scores, n, exclude=~np.isnan(R))  # 評価済みは除外
+        n = top.shape[1]
+
+        users = np.repeat(np.asarray(ratings.index), n)
+        rows = pd.DataFrame({
+            "user": users,
+            "rank": np.tile(np.arange(1, n + 1), len(R)),
+            "movie": np.asarray(self.columns, dtype=object)[top.ravel()],
+            "score": top_scores.ravel(),
+        })
+        # 未評価の映画が n 本に満たないユーザーの穴埋め分を落とす
+        return rows[np.isfinite(rows["score"])].reset_index(drop=True)
+
+
+def load_model(path):
+    """保存済みのモデルを読む。ファイルがない・壊れていて読めないときは None（学習し直す）。"""
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        return MFModel.load(path)
+    except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+
+
+def _normalize(config):
+    # 保存後の JSON と比べられるように、タプルなどを JSON と同じ形にそろえる
+    return json.loads(json.dumps(config))
+
+
+def get_model(ratings, M, k, engine="gd", seed=0, model_path=None, **params):
+    """評価表（DataFrame）から学習したモデルを返す。同じデータ・設定なら学習は一度だけ。
+    params はエンジンごとの設定（gd なら lr, E、als なら iters）。
+    model_path を指定すると、同じデータ・設定で保存済みのモデルがあればそれを読み込み、
+    評価表が変わっていれば保存済みの因子からウォームスタートして学習し直して保存する。
+    """
+    key = (fingerprint(ratings), M, k, engine, seed, tuple(sorted(params.items())))
+    if key not in _models:
+        config = _normalize({"M": M, "k": k, "engine": engine, "seed": seed, **params})
+        saved = load_model(model_path)
+        if saved is not None and saved.data_fingerprint == key[0] and saved.params == config:
+            model = saved
+        else:
+            init = None
+            if saved is not None and saved.params.get("M") == M:
+                init = saved.warm_start(ratings)
+            R = ratings.to_numpy(dtype=np.float64)
+            U, V, history = train(R, M, k, engine=engine, seed=seed, init=init, **params)
+            model = MFModel(U, V, ratings.columns, k, history, ratings.index, config, key[0])
+            if model_path:
+                model.save(model_path)
+        _models.clear()  # 古いデータのモデルは捨てる
+        _models[key] = model
+    return _models[key]
+
+
+def get_best_model(ratings, Ms, ks, seeds, engine="als", processes=None, model_path=None, **params):
+    """train_best で選んだモデルを返す。get_model と同じく同じデータ・設定なら一度だけ学習する。
+    model_path に同じ探索設定のモデルが保存されていれば、データが同じならそのまま使い、
+    データが変わっていれば探索はやり直さず、前回選んだ M・k・種でウォームスタートする。
+    """
+    key = (fingerprint(ratings), tuple(Ms), tuple(ks), tuple(seeds), engine, "best",
+           tuple(sorted(params.items())))
+    if key not in _models:
+        search = _normalize({"Ms": list(Ms), "ks": list(ks), "seeds": list(seeds), "engine": engine, **params})
+        saved = load_model(model_path)
+        R = ratings.to_numpy(dtype=np.float64)
+        if saved is not None and saved.params.get("search") == search:
+            if saved.data_fingerprint == key[0]:
+                model = saved
+            else:
+                M, k, seed = saved.params["M"], saved.params["k"], saved.params["seed"]
+                U, V, history = train(R, M, k, engine=engine, seed=seed,
+                                      init=saved.warm_start(ratings), **params)
+                model = MFModel(U, V, ratings.columns, k, history, ratings.index,
+                                dict(saved.params), key[0])
+        else:
+            M, k, seed, U, V, history, results = train_best(
+                R, Ms, ks, seeds, engine=engine, processes=processes, **params)
+            config = {"M": M, "k": k, "seed": seed, "search": search, "candidates": results}
+            model = MFModel(U, V, ratings.columns, k, history, ratings.index, config, key[0])
+        if model_path and model is not saved:
+            model.save(model_path)
+        _models.clear()  # 古いデータのモデルは捨てる
+        _models[key] = model
+    return _models[key]
+
+if __name__ == "__main__":
+    # 例: python movie_model.py recommend movie_snapshot --top 3 --out recs.csv
+    parser = argparse.ArgumentParser(description="映画推薦モデル")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_rec = sub.add_parser("recommend", help="評価表の全ユーザー（または別の表のユーザー）にまとめて推薦")
+    p_rec.add_argument("source", nargs="?", default=None, help="学習に使う評価表")
+    p_rec.add_argument("--users", default=None, help="推薦するユーザーの評価表（省略時は source の全員）")
+    p_rec.add_argument("--top", type=int, default=3)
+    p_rec.add_argument("--engine", default="als", choices=list(ENGINES))
+    p_rec.add_argument("-M", type=int, default=4)
+    p_rec.add_argument("-k", type=float, default=0.5)
+    p_rec.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    ratings = load_ratings(args.source)
+    model = get_model(ratings, args.M, args.k, engine=args.engine, **ENGINE_DEFAULTS[args.engine])
+    users = ratings if args.users is None else load_ratings(args.users)
+    recs = model.recommend_batch(users, n=args.top)
+    if args.out:
+        recs.to_csv(args.out, index=False)
+    else:
+        print(recs.to_string(index=False))
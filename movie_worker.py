@@ -0,0 +1,108 @@
+import threading
+import time
+import traceback
+
+from movie_data import load_ratings, resolve_source, source_key
+
+# 名前 -> ModelService（Streamlit の再実行やセッションをまたいで1つだけ動かす）
+_services = {}
+_services_lock = threading.Lock()
+# 名前 -> 学習用のロック。設定変更で作り直した新旧のサービスが同じ保存先へ同時に書かないようにする
+_build_locks = {}
+
+
+class ModelService:
+    """モデルの学習を裏のスレッドで受け持ち、できあがったモデルを版番号つきで公開する。
+    画面側は latest() で最新の公開済みモデルを取り出し、当てはめと順位付けだけを行う。
+    学習中も前の版がそのまま使えるので、画面が止まることはない。
+    """
+
+    def __init__(self, build, source=None, interval=30.0, config=None, build_lock=None):
+        self.build = build        # 評価表（DataFrame） -> MFModel
+        self.source = source      # load_ratings に渡す読み込み先
+        self.interval = interval  # 評価表の更新を確認する間隔（秒）
+        self.config = config      # build が使う学習設定（変わったらサービスごと作り直す）
+        self.error = None         # 直近の学習の失敗（成功したら None に戻る）
+        self._published = None    # (版番号, モデル, 学習元の版)
+        self._force = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._build_lock = build_lock or threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="movie-model-service", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """止める。学習中なら、その結果は公開しない（保存はロックで新しいサービスと順番に行う）。"""
+        self._stop.set()
+        self._wake.set()
+
+    def latest(self):
+        """(版番号, モデル)。まだ一度も学習が終わっていなければ None。"""
+        published = self._published
+        return None if published is None else published[:2]
+
+    def request_retrain(self):
+        """評価表が変わっていなくても次の周回で学習し直す。"""
+        with self._lock:
+            self._force = True
+        self._wake.set()
+
+    def _publish(self, model, data_key):
+        with self._lock:
+            version = 1 if self._published is None else self._published[0] + 1
+            # 参照の差し替えは一度に行われるので、読む側は古い版か新しい版のどちらかを見る
+            self._published = (version, model, data_key)
+
+    def _run(self):
+        while not self._stop.is_set():
+            data_key = source_key(resolve_source(self.source))
+            published = self._published
+            with self._lock:
+                force, self._force = self._force, False
+            if force or published is None or published[2] != data_key:
+                try:
+                    with self._build_lock:
+                        # ロック待ちの間に止められていたら、学習も保存もしない
+                        if self._stop.is_set():
+                            break
+                        model = self.build(load_ratings(self.source))
+                    if self._stop.is_set():
+                        break
+                    self._publish(model, data_key)
+                    self.error = None
+                except Exception:
+                    self.error = traceback.format_exc()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+def get_service(name, build, source=None, interval=30.0, config=None):
+    """name ごとに1つだけ ModelService を作って動かす。2回目以降は同じものを返す。
+    ただし config（学習設定）や source が前回と違えば、古いサービスを止めて今回の build で作り直す。
+    同じ name のサービスは学習用のロックを共有するので、古いサービスの学習が終わるまで新しい方は待つ。
+    """
+    with _services_lock:
+        service = _services.get(name)
+        if service is not None and (service.config != config or service.source != source):
+            service.stop()
+            service = None
+        if service is None:
+            build_lock = _build_locks.setdefault(name, threading.Lock())
+            service = _services[name] = ModelService(build, source, interval, config, build_lock).start()
+        return service
+
+
+def wait_for_model(service, timeout=None):
+    """最初の版が公開されるまで待つ（バッチ処理やテスト用）。"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while service.latest() is None:
+        if deadline is not None and time.monotonic() > deadline:
+            return None
+        time.sleep(0.05)
+    return service.latest()
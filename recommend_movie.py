@@ -1,14 +1,22 @@
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
-# ファイルの読み込み
-url = "https://github.com/aimathstats/dataviz1/raw/refs/heads/main/data/movie_rate.xlsx"
-real2 = pd.read_excel(url)
+from movie_data import load_ratings
+from movie_model import get_best_model, top_k
+from movie_worker import get_service
+# ファイルの読み込み（一度読んだらキャッシュ。MOVIE_RATE_PATH でローカルのファイルやスナップショットを指定できる）
+real2 = load_ratings()
 # 初期設定
 M = 4   # 因子数
 k = 0.5
-lr = 0.001
-E = 20000
+engine = "als"  # 学習エンジン（"gd": 勾配法, "als": 交互最小二乗法）
+lr = 0.001    # gd の学習率
+E = 20000     # gd の反復回数
+iters = 30    # als の反復回数
+tol = 1e-4    # RMSE の改善がこれ未満になったら学習を打ち切る
+restarts = 4  # 乱数の種を変えた学習の本数（大きな評価表ならプロセスを分けて並列に学習し、検証誤差の最も小さいものを使う）
+model_path = os.environ.get("MOVIE_MODEL_PATH", "models/movie_model.npz")  # 学習済みモデルの保存先
 # 画面表示
 st.title("映画推薦システム")
 st.write("10段階で見たことある映画を評価してください")
@@ -18,32 +26,46 @@ for movie in movie_list:
     rating = st.slider(f"{movie}", 0, 10, 0)
     user_input[movie] = np.nan if rating == 0 else rating
 
-if st.button("推薦を表示"):
-    # 新しい行として追加
-    user_series = pd.Series(user_input) #ひとまずスライダー入力をseries形式に保存
-    real2_with_user = pd.concat([real2, user_series.to_frame().T], ignore_index=True) #Seriesをdfに変換
+def build_model(ratings):
+    # 裏のスレッドで実行される（既存ユーザーで学習し、新しいユーザーは V を固定して当てはめる）
+    seeds = range(restarts)
+    if engine == "als":
+        return get_best_model(ratings, [M], [k], seeds, engine="als",
+                              model_path=model_path, iters=iters, tol=tol)
+    return get_best_model(ratings, [M], [k], seeds, engine="gd",
+                          model_path=model_path, lr=lr, E=E, tol=tol)
 
-    # 初期化
-    n, D = real2_with_user.shape
-    U = np.random.normal(1, 0.25, (n, M))
-    V = np.random.normal(1, 0.25, (D, M))
+# 学習は裏のサービスに任せ、画面では公開済みの最新モデルを使うだけにする
+# （上の設定を書き換えたら、その設定で学習するサービスに切り替わる）
+config = {"M": M, "k": k, "engine": engine, "lr": lr, "E": E, "iters": iters, "tol": tol,
+          "restarts": restarts, "model_path": model_path}
+service = get_service("movie", build_model, config=config)
 
-    # 学習（誤差逆伝播法）
-    for _ in range(E):
-        error = real2_with_user.values - np.dot(U, V.T)
-        error[np.isnan(real2_with_user.values)] = 0
-        gradU = 2 * np.dot(error, V) - 2 * k * U
-        gradV = 2 * np.dot(error.T, U) - 2 * k * V
-        U += lr * gradU
-        V += lr * gradV
+if st.button("推薦を表示"):
+    user_series = pd.Series(user_input) #ひとまずスライダー入力をseries形式に保存
 
-    pred_matrix = np.dot(U, V.T)
-    user_pred = pd.Series(pred_matrix[-1], index=real2_with_user.columns)
+    published = service.latest()
+    if published is None:
+        if service.error:
+            # 学習が失敗し続けているときは、待っても終わらないことを伝える
+            st.error("モデルの学習に失敗しました。評価表やモデルの保存先を確認してください。")
+            with st.expander("エラーの詳細"):
+                st.code(service.error)
+        else:
+            st.info("モデルを準備中です。少し待ってからもう一度押してください。")
+        st.stop()
+    version, model = published
+    user_pred = pd.Series(model.predict(user_series.reindex(model.columns).values), index=model.columns)
 
     # すでに評価した映画を除外
-    rated = ~user_series.isna() # 評価済みをブールで取得（~はブールの否定演算子で、T/Fを反転
-    recs = user_pred[~rated].sort_values(ascending=False).head(3) # 未評価映画のスコアの高い順に並べ替えて、上位３つ取得して格納
+    rated = ~user_series.reindex(model.columns).isna() # 評価済みをブールで取得（~はブールの否定演算子で、T/Fを反転
+    top, _ = top_k(user_pred.values, 3, exclude=rated.values) # 未評価映画のうちスコアの高い上位３つの位置（全体は並べ替えない）
+    recs = user_pred.iloc[top]
 
     st.subheader("あなたに推薦の映画")
     for i, (movie, score) in enumerate(recs.items(), 1):
         st.write(f"{i}.　{movie} ({score:.2f})")
+
+    # 学習の様子（反復回数と RMSE）
+    with st.expander(f"学習曲線（モデル第{version}版）"):
+        st.line_chart(pd.DataFrame(model.history).set_index("iter"))
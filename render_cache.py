@@ -0,0 +1,190 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+# Named caches shared by every Streamlit session and rerun in this process.
+# (The app scripts themselves are re-executed on each rerun, so state kept there is lost.)
+_caches = {}
+_caches_lock = threading.Lock()
+# Results of one-off warm-ups (name -> stats), so each runs once per process
+_warmups = {}
+_warmup_locks = {}
+# Thread pool for rendering cache misses, started on first use and kept for the process
+_pool = None
+
+# Compressed image bytes ready for st.image, with a SHA-1 of the bytes
+EncodedImage = namedtuple("EncodedImage", ["data", "digest", "format"])
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used cache with hit/miss counters.
+    Safe to share between Streamlit sessions (each runs in its own thread).
+    """
+    __slots__ = ("maxsize", "hits", "misses", "_data", "_lock")
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key, factory):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        # Build outside the lock so a slow render doesn't block other sessions
+        value = factory()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def values(self):
+        with self._lock:
+            return list(self._data.values())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def get_cache(name, maxsize=128):
+    """Return the process-wide cache called `name`, creating it on first use."""
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = LRUCache(maxsize)
+        return _caches[name]
+
+
+def image_nbytes(img):
+    """Decoded in-memory size of a PIL image."""
+    return img.width * img.height * len(img.getbands())
+
+
+def sprite_path(directory, key):
+    return os.path.join(directory, "_".join(str(part) for part in key) + ".png")
+
+
+def export_sprites(directory, keys, factory):
+    """
+    Write factory(key) as a PNG for every key (build-time atlas). Returns timing/size stats.
+    Each sprite is written to a temp file and moved into place, so a crash or a second
+    process never leaves a half-written sprite under its final name.
+    """
+    os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+    total = 0
+    for key in keys:
+        path = sprite_path(directory, key)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".png.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                factory(key).save(f, format="PNG", optimize=True)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        total += os.path.getsize(path)
+    return {"count": len(keys), "seconds": time.perf_counter() - start, "disk_bytes": total}
+
+
+def load_sprite(directory, key):
+    """Read a sprite written by export_sprites, or None if it is missing."""
+    path = sprite_path(directory, key)
+    if not os.path.exists(path):
+        return None
+    with Image.open(path) as img:
+        return img.convert("RGB")
+
+
+def render_pool(workers=4):
+    """The process-wide render pool (the first call decides its size)."""
+    global _pool
+    with _caches_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        return _pool
+
+
+def warm_once(name, fn):
+    """Run fn() once per process and remember its result (e.g. atlas build stats)."""
+    with _caches_lock:
+        if name in _warmups:
+            return _warmups[name]
+        lock = _warmup_locks.setdefault(name, threading.Lock())
+    # Only this name's lock is held while fn() runs, so fn() may warm up other names
+    # (the eager atlas build needs the compositor masks) without deadlocking
+    with lock:
+        if name not in _warmups:
+            _warmups[name] = fn()
+        return _warmups[name]
+
+
+def fill(cache, keys, factory):
+    """Pre-render every key into the cache (eager atlas). Returns timing/memory stats."""
+    start = time.perf_counter()
+    for key in keys:
+        cache.get_or_create(key, lambda key=key: factory(key))
+    return {
+        "count": len(keys),
+        "seconds": time.perf_counter() - start,
+        "memory_bytes": sum(image_nbytes(img) for img in cache.values()),
+    }
+
+
+def encode_image(img, fmt="PNG"):
+    """Compress a PIL image once; the digest identifies identical images."""
+    buf = io.BytesIO()
+    options = {"optimize": True} if fmt == "PNG" else {}
+    img.save(buf, format=fmt, **options)
+    data = buf.getvalue()
+    return EncodedImage(data, hashlib.sha1(data).hexdigest(), fmt)
+
+
+def encoded(name, key, render, fmt="PNG", maxsize=256):
+    """
+    Encoded bytes for the image render() would produce, cached by `key` (a visual signature).
+    st.image passes PNG/WebP bytes through as-is, so a cached image skips both the drawing
+    and the re-encode on every rerun.
+    """
+    cache = encoded_cache(name, fmt, maxsize)
+    return cache.get_or_create(key, lambda: encode_image(render(), fmt))
+
+
+def encoded_cache(name, fmt="PNG", maxsize=256):
+    """The cache encoded(name, ...) stores its bytes in."""
+    return get_cache(f"{name}.{fmt.lower()}", maxsize)
+
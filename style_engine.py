@@ -0,0 +1,737 @@
+import itertools
+import os
+import random
+from types import MappingProxyType
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from render_cache import (
+    encoded, encoded_cache, export_sprites, fill, get_cache, load_sprite, render_pool, sprite_path, warm_once
+)
+from style_relations import pair_table, relation_table
+
+# Shared outfit recommendation core for the Streamlit front-ends
+# (gemini.py, UItest.py, app.py, NEWapp.py, Pillowtest.py).
+# Everything here is built once at import and shared by every rerun and session in the process.
+
+# ==============================================================================
+# DATA DEFINITIONS
+# ==============================================================================
+GENRES = ("Streetwear", "Casual", "Minimal", "Techwear", "Vintage", "Formal")
+COLORS = ("Black", "White", "Gray", "Navy", "Brown", "Beige", "Green", "Red")
+
+# Enhanced Palette (RGB)
+COLOR_MAP = {
+    "Black": (20, 20, 20),
+    "White": (245, 245, 245),
+    "Gray": (120, 120, 125),
+    "Navy": (30, 45, 80),
+    "Brown": (100, 70, 50),
+    "Beige": (220, 210, 190),
+    "Green": (55, 90, 60),
+    "Red": (160, 40, 40)
+}
+
+OUTFIT_LIBRARY = {
+    "Streetwear": {
+        "inner": ["Oversized Tee", "Graphic Hoodie"],
+        "outer": ["Bomber Jacket", "Puffer Vest"],
+        "bottom": ["Cargo Pants", "Joggers"],
+        "skirt": ["Pleated Mini", "Sport Skirt"],
+        "shoe": ["Chunky Sneakers", "High Tops"]
+    },
+    "Casual": {
+        "inner": ["Cotton Tee", "Soft Knit"],
+        "outer": ["Denim Jacket", "Cardigan"],
+        "bottom": ["Straight Jeans", "Chinos"],
+        "skirt": ["A-Line Skirt", "Long Denim Skirt"],
+        "shoe": ["Low Sneakers", "Loafers"]
+    },
+    "Minimal": {
+        "inner": ["Mock Neck", "Crisp Shirt"],
+        "outer": ["Trench Coat", "Wool Coat"],
+        "bottom": ["Tapered Slacks", "Wide Trousers"],
+        "skirt": ["Silk Skirt", "Pencil Skirt"],
+        "shoe": ["Leather Boots", "Minimal Sneakers"]
+    },
+    "Techwear": {
+        "inner": ["Compression Top", "Tech Tee"],
+        "outer": ["Hardshell Parka", "Utility Vest"],
+        "bottom": ["Tech Cargo", "Nylon Pants"],
+        "skirt": ["Box Pleat Skirt", "Utility Skirt"],
+        "shoe": ["Tactical Boots", "Running Shoes"]
+    },
+    "Vintage": {
+        "inner": ["Ringer Tee", "Flannel Shirt"],
+        "outer": ["Corduroy Jacket", "Varsity Jacket"],
+        "bottom": ["Washed Jeans", "Corduroy Pants"],
+        "skirt": ["Checkered Skirt", "Midi Skirt"],
+        "shoe": ["Retro Trainers", "Leather Shoes"]
+    },
+    "Formal": {
+        "inner": ["Dress Shirt", "Silk Blouse"],
+        "outer": ["Tailored Blazer", "Long Coat"],
+        "bottom": ["Dress Trousers", "Pressed Slacks"],
+        "skirt": ["Wait Skirt", "Formal Midi"],
+        "shoe": ["Derby Shoes", "Heels"]
+    }
+}
+
+# Similarity/Affinity Matrix for Content-Based Recommendation (0.0 - 1.0)
+GENRE_RELATIONS = {
+    "Streetwear": {"Techwear": 0.9, "Casual": 0.6, "Vintage": 0.4},
+    "Casual": {"Minimal": 0.7, "Vintage": 0.7, "Streetwear": 0.5, "Formal": 0.3},
+    "Minimal": {"Casual": 0.7, "Formal": 0.8, "Techwear": 0.4, "Streetwear": 0.2},
+    "Techwear": {"Streetwear": 0.9, "Minimal": 0.5},
+    "Vintage": {"Casual": 0.7, "Streetwear": 0.4, "Formal": 0.2},
+    "Formal": {"Minimal": 0.8, "Casual": 0.3}
+}
+
+COLOR_RELATIONS = {
+    "Black": {"Gray": 0.9, "Navy": 0.8, "White": 0.6},
+    "White": {"Beige": 0.8, "Gray": 0.7, "Black": 0.5},
+    "Gray": {"Black": 0.9, "White": 0.8, "Navy": 0.7},
+    "Navy": {"Black": 0.8, "Gray": 0.7, "Green": 0.4},
+    "Brown": {"Beige": 0.9, "Green": 0.6},
+    "Beige": {"Brown": 0.9, "White": 0.8, "Green": 0.5},
+    "Green": {"Brown": 0.6, "Beige": 0.6, "Navy": 0.4},
+    "Red": {"Brown": 0.3, "Black": 0.2}
+}
+
+# Basic pairings for better harmony
+COLOR_PAIRS = {
+    "Black": ["White", "Gray", "Beige", "Red"],
+    "White": ["Black", "Navy", "Beige", "Gray"],
+    "Navy": ["White", "Beige", "Gray"],
+    "Brown": ["Beige", "White", "Navy"],
+    "Beige": ["Brown", "Navy", "Black", "White"],
+    "Gray": ["Black", "White", "Navy"],
+    "Green": ["Beige", "Black", "White"],
+    "Red": ["Black", "White", "Denim"]
+}
+COLOR_ALIASES = {"Denim": "Navy"}  # Denim handled as Navy visual often
+
+# Palette and part templates of the simple silhouette apps (app.py, NEWapp.py, Pillowtest.py)
+COLOR_RGB = {
+    "Black": (30, 30, 30),
+    "White": (240, 240, 240),
+    "Gray": (160, 160, 160),
+    "Navy": (40, 60, 100),
+    "Brown": (120, 80, 50),
+    "Beige": (210, 200, 170),
+    "Green": (60, 120, 80),
+    "Red": (160, 50, 50)
+}
+
+BASIC_OUTFIT_LIBRARY = {
+    "Streetwear": {
+        "inner": ["Graphic Tee", "Long Sleeve Tee"],
+        "outer": ["Hoodie", "Zip Hoodie"],
+        "bottom": ["Wide Pants", "Cargo Pants"],
+        "skirt": ["Mini Skirt", "Pleated Skirt"]
+    },
+    "Casual": {
+        "inner": ["Plain T-Shirt", "Knit"],
+        "outer": ["Cardigan", "Light Jacket"],
+        "bottom": ["Denim", "Chinos"],
+        "skirt": ["Flare Skirt", "Long Skirt"]
+    },
+    "Minimal": {
+        "inner": ["Plain Tee"],
+        "outer": ["Tailored Jacket"],
+        "bottom": ["Slim Slacks"],
+        "skirt": ["Straight Skirt"]
+    },
+    "Techwear": {
+        "inner": ["Functional Tee"],
+        "outer": ["Shell Jacket"],
+        "bottom": ["Tech Pants"],
+        "skirt": ["Tech Skirt"]
+    },
+    "Vintage": {
+        "inner": ["Retro Tee"],
+        "outer": ["Denim Jacket"],
+        "bottom": ["Straight Jeans"],
+        "skirt": ["Retro Skirt"]
+    },
+    "Formal": {
+        "inner": ["Dress Shirt"],
+        "outer": ["Blazer"],
+        "bottom": ["Slacks"],
+        "skirt": ["Tight Skirt"]
+    }
+}
+
+
+class StyleConfig:
+    """
+    Frozen, index-based view of one style catalogue.
+    genre_index / color_index map names to positions, palette[i] is the RGB of colors[i],
+    and the outfit library is read-only. Relation and pairing tables are compiled
+    (see style_relations) when their data is given, otherwise left as None.
+    """
+    __slots__ = (
+        "genres", "colors", "genre_index", "color_index", "color_map", "palette",
+        "outfit_library", "genre_table", "color_table", "pair_table",
+    )
+
+    def __init__(self, genres, colors, color_map, outfit_library,
+                 genre_relations=None, color_relations=None, color_pairs=None, color_aliases=None):
+        self.genres = tuple(genres)
+        self.colors = tuple(colors)
+        self.genre_index = MappingProxyType({genre: i for i, genre in enumerate(self.genres)})
+        self.color_index = MappingProxyType({color: i for i, color in enumerate(self.colors)})
+        self.color_map = MappingProxyType({color: tuple(color_map[color]) for color in self.colors})
+        palette = np.array([color_map[color] for color in self.colors], dtype=np.float32)
+        palette.setflags(write=False)
+        self.palette = palette
+        self.outfit_library = MappingProxyType({
+            genre: MappingProxyType({slot: tuple(items) for slot, items in outfit_library[genre].items()})
+            for genre in self.genres
+        })
+        self.genre_table = relation_table(genre_relations, self.genres) if genre_relations else None
+        self.color_table = relation_table(color_relations, self.colors) if color_relations else None
+        self.pair_table = pair_table(color_pairs, self.colors, color_aliases) if color_pairs else None
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError(f"{type(self).__name__} is frozen")
+        object.__setattr__(self, name, value)
+
+
+# Catalogue of the avatar apps (gemini.py, UItest.py)
+STYLE = StyleConfig(
+    GENRES, COLORS, COLOR_MAP, OUTFIT_LIBRARY,
+    GENRE_RELATIONS, COLOR_RELATIONS, COLOR_PAIRS, COLOR_ALIASES
+)
+# Catalogue of the simple silhouette apps
+BASIC_STYLE = StyleConfig(GENRES, COLORS, COLOR_RGB, BASIC_OUTFIT_LIBRARY)
+
+# ==============================================================================
+# LOGIC CORE
+# ==============================================================================
+def complete_scores(scores: dict):
+    """Content-based completion: unrated (0) keys get the average score."""
+    avg = sum(scores.values()) / len(scores)
+    return {k: (v if v > 0 else round(avg, 2)) for k, v in scores.items()}
+
+
+def top_keys(scores: dict, n=3):
+    return sorted(scores, key=scores.get, reverse=True)[:n]
+
+
+class RecommendationEngine:
+    @staticmethod
+    def infer_weights_matrix(scores, affinity):
+        """
+        Vectorized inference over a 2-D array of scores (one user per row).
+        NewWeight = Max( OtherScore * Affinity ) * 0.8 for every zero-scored key,
+        explicit positive scores are kept as-is.
+        """
+        scores = np.asarray(scores, dtype=float)
+        liked = np.where(scores > 0, scores, 0.0)
+        # (users, key, other) products, max over the other keys
+        inferred = (liked[:, None, :] * affinity[None, :, :]).max(axis=2)
+        # Apply a slight penalty to inferred scores so explicit choices usually win
+        return np.where(scores > 0, scores, np.maximum(0, inferred * 0.8))
+
+    @staticmethod
+    def infer_weights(user_scores, table, hops=1, mode="max"):
+        """
+        If a user scores an item 0, try to infer a weight based on their positive scores
+        and the relation table. Weights are returned in table.keys order.
+        NewWeight = Max( OtherScore * Affinity ) for all OtherItems
+        With hops > 1 the affinity reaches items several relations away
+        (precomputed closure, see RelationTable.closure), which helps sparse profiles.
+        """
+        scores = np.array([[user_scores.get(key, 0) for key in table.keys]], dtype=float)
+        affinity = table.closure(hops, mode)
+        return RecommendationEngine.infer_weights_matrix(scores, affinity)[0].tolist()
+
+    @staticmethod
+    def infer_weights_batch(score_matrix, table, hops=1, mode="max"):
+        """Same as infer_weights for many users at once (rows of score_matrix, columns in table.keys order)."""
+        return RecommendationEngine.infer_weights_matrix(score_matrix, table.closure(hops, mode))
+
+
+class OutfitGenerator:
+    @staticmethod
+    def get_complementary_color(base_color, color_scores):
+        # Precompiled pairings (unknown names such as "Denim" are resolved at import)
+        candidates = STYLE.pair_table.candidates(base_color)
+
+        # Filter candidates to ensure they exist in user prefs, default weight 1 if missing for safety
+        weights = [color_scores.get(c, 0) for c in candidates]
+
+        # Fallback if weights are all 0
+        if sum(weights) == 0:
+            weights = [1] * len(candidates)
+
+        return random.choices(candidates, weights=weights, k=1)[0]
+
+    @staticmethod
+    def create(genre, base_color, gender, use_outer, color_scores):
+        lib = STYLE.outfit_library.get(genre, STYLE.outfit_library["Casual"])
+
+        # Color Logic
+        accent_color = OutfitGenerator.get_complementary_color(base_color, color_scores)
+
+        # Item Selection
+        is_skirt = (gender == "Female" and random.random() < 0.6)
+
+        inner_item = random.choice(lib["inner"])
+        outer_item = random.choice(lib["outer"]) if use_outer else None
+        bottom_item = random.choice(lib["skirt"]) if is_skirt else random.choice(lib["bottom"])
+        shoe_item = random.choice(lib["shoe"])
+
+        return {
+            "genre": genre,
+            "main_color": base_color,
+            "accent_color": accent_color,
+            "items": {
+                "inner": inner_item,
+                "outer": outer_item,
+                "bottom": bottom_item,
+                "shoe": shoe_item
+            },
+            "meta": {
+                "is_skirt": is_skirt,
+                "has_outer": use_outer
+            }
+        }
+
+
+# ==============================================================================
+# SIMPLE SILHOUETTE PIPELINE (app.py, NEWapp.py, Pillowtest.py)
+# ==============================================================================
+def generate_outfit(genre, color, gender="Male", use_outer=True):
+    parts = BASIC_STYLE.outfit_library[genre]
+
+    use_skirt = gender == "Female" and random.random() < 0.5
+    bottom_item = random.choice(parts["skirt"] if use_skirt else parts["bottom"])
+
+    return {
+        "Genre": genre,
+        "Color Theme": color,
+        "Inner": f"{color} {random.choice(parts['inner'])}",
+        "Outer": f"{color} {random.choice(parts['outer'])}" if use_outer else None,
+        "HasOuter": use_outer,
+        "Bottom": f"{color} {bottom_item}",
+        "BottomType": "Skirt" if use_skirt else "Pants"
+    }
+
+
+def recommend(genre_scores, color_scores, gender="Male", use_outer=True, n=3):
+    """
+    Complete the ratings, then one outfit for each of the top n genres,
+    each in one of the top n colors (repeating a color only once all are used).
+    """
+    genre_scores = complete_scores(genre_scores)
+    color_scores = complete_scores(color_scores)
+    top_colors = top_keys(color_scores, n)
+
+    outfits = []
+    used_colors = []
+    for genre in top_keys(genre_scores, n):
+        color = random.choice([c for c in top_colors if c not in used_colors] or top_colors)
+        used_colors.append(color)
+        outfits.append(generate_outfit(genre, color, gender, use_outer))
+
+    return {"genre_scores": genre_scores, "color_scores": color_scores, "outfits": outfits}
+
+
+def generate_image(outfit):
+    base = BASIC_STYLE.color_map[outfit["Color Theme"]]
+    skin = (220, 200, 180)
+    inner_color = tuple(min(255, c + 35) for c in base)
+    bottom_color = tuple(max(0, c - 50) for c in base)
+
+    img = Image.new("RGB", (260, 440), (245, 245, 245))
+    d = ImageDraw.Draw(img)
+
+    # Head & Neck
+    d.ellipse([105, 20, 155, 70], fill=skin, outline="black")
+    d.rectangle([120, 70, 140, 95], fill=skin, outline="black")
+
+    # Body Layout
+    if outfit["HasOuter"]:
+        # Arms
+        d.rectangle([50, 120, 80, 260], fill=base, outline="black")
+        d.rectangle([180, 120, 210, 260], fill=base, outline="black")
+
+        # Outer
+        d.polygon(
+            [(70, 100), (190, 100), (210, 270), (50, 270)],
+            fill=base, outline="black"
+        )
+
+        # Inner
+        d.rectangle([95, 120, 165, 250], fill=inner_color, outline="black")
+
+        # Hoodie hood
+        if outfit["Outer"] and "Hoodie" in outfit["Outer"]:
+            d.arc([85, 75, 175, 145], start=0, end=180, fill="black", width=4)
+
+    else:
+        # Inner only (arms joined to the torso)
+        d.rectangle([75, 100, 185, 260], fill=inner_color, outline="black")
+        d.rectangle([55, 120, 75, 260], fill=inner_color, outline="black")
+        d.rectangle([185, 120, 205, 260], fill=inner_color, outline="black")
+
+    # Bottom
+    if outfit["BottomType"] == "Skirt":
+        d.polygon(
+            [(85, 260), (175, 260), (200, 350), (60, 350)],
+            fill=bottom_color, outline="black"
+        )
+        d.rectangle([110, 350, 130, 400], fill=skin, outline="black")
+        d.rectangle([130, 350, 150, 400], fill=skin, outline="black")
+    else:
+        d.rectangle([95, 270, 125, 400], fill=bottom_color, outline="black")
+        d.rectangle([135, 270, 165, 400], fill=bottom_color, outline="black")
+
+    # Shoes
+    d.rectangle([90, 400, 130, 420], fill=(40, 40, 40))
+    d.rectangle([130, 400, 170, 420], fill=(40, 40, 40))
+
+    return img
+
+
+def image_signature(outfit):
+    # generate_image only looks at these, so equal signatures give identical pictures
+    return (
+        outfit["Color Theme"],
+        outfit["HasOuter"],
+        bool(outfit["Outer"]) and "Hoodie" in outfit["Outer"],
+        outfit["BottomType"],
+    )
+
+
+def generate_silhouette_image(outfit):
+    """app.py's drawing: shaded arms, collar V-zone and a Graphic Tee logo (always pants + outer)."""
+    base_color = BASIC_STYLE.color_map[outfit["Color Theme"]]
+
+    img = Image.new("RGB", (260, 440), (245, 245, 245))
+    d = ImageDraw.Draw(img)
+
+    # Colors
+    skin = (220, 200, 180)
+    shadow = tuple(max(0, c - 30) for c in base_color)
+    inner_color = tuple(min(255, c + 35) for c in base_color)
+    bottom_color = tuple(max(0, c - 50) for c in base_color)
+
+    # Head
+    d.ellipse([105, 20, 155, 70], fill=skin, outline="black")
+
+    # Neck
+    d.rectangle([120, 70, 140, 95], fill=skin)
+
+    # Arms
+    d.rectangle([50, 120, 80, 260], fill=shadow)
+    d.rectangle([180, 120, 210, 260], fill=shadow)
+
+    # Outer
+    d.polygon(
+        [(70, 100), (190, 100), (210, 270), (50, 270)],
+        fill=base_color,
+        outline="black"
+    )
+
+    # Inner
+    d.rectangle([95, 120, 165, 250], fill=inner_color, outline="black")
+
+    # Collar / V-zone
+    d.polygon(
+        [(115, 120), (145, 120), (130, 150)],
+        fill=(240, 240, 240)
+    )
+
+    # Hoodie hood
+    if outfit["Outer"] and "Hoodie" in outfit["Outer"]:
+        d.arc([85, 75, 175, 145], start=0, end=180, fill="black", width=4)
+
+    # Graphic Tee
+    if "Graphic Tee" in outfit["Inner"]:
+        d.rectangle([115, 170, 145, 200], fill=(255, 255, 255))
+
+    # Bottom (legs separated)
+    d.rectangle([95, 270, 125, 400], fill=bottom_color, outline="black")
+    d.rectangle([135, 270, 165, 400], fill=bottom_color, outline="black")
+
+    # Shoes
+    d.rectangle([90, 400, 130, 420], fill=(40, 40, 40))
+    d.rectangle([130, 400, 170, 420], fill=(40, 40, 40))
+
+    return img
+
+
+def generate_sketch_image(outfit):
+    """NEWapp.py's drawing: flat blocks for outer, inner and bottom."""
+    base_color = BASIC_STYLE.color_map[outfit["Color Theme"]]
+
+    img = Image.new("RGB", (260, 440), (255, 255, 255))
+    d = ImageDraw.Draw(img)
+
+    # Head
+    d.ellipse([100, 20, 160, 80], fill=(220, 200, 180))
+
+    # Outer (Jacket / Hoodie)
+    d.rectangle([60, 100, 200, 260], fill=base_color, outline="black", width=3)
+
+    # Hoodie hood
+    if outfit["Outer"] and "Hoodie" in outfit["Outer"]:
+        d.arc([80, 80, 180, 140], start=0, end=180, fill="black", width=4)
+
+    # Inner (Tee / Shirt)
+    inner_color = tuple(min(255, c + 40) for c in base_color)
+    d.rectangle([80, 120, 180, 240], fill=inner_color, outline="black", width=2)
+
+    # Graphic Tee logo
+    if "Graphic Tee" in outfit["Inner"]:
+        d.rectangle([110, 160, 150, 200], fill=(255, 255, 255))
+
+    # Bottom
+    bottom_color = tuple(max(0, c - 40) for c in base_color)
+    d.rectangle([90, 260, 170, 400], fill=bottom_color, outline="black", width=3)
+
+    return img
+
+
+def graphic_signature(outfit):
+    # The silhouette and sketch drawings only look at these
+    return (
+        outfit["Color Theme"],
+        bool(outfit["Outer"]) and "Hoodie" in outfit["Outer"],
+        "Graphic Tee" in outfit["Inner"],
+    )
+
+
+# Drawing variant -> (draw function, visual signature)
+IMAGE_STYLES = {
+    "unified": (generate_image, image_signature),                  # Pillowtest.py
+    "silhouette": (generate_silhouette_image, graphic_signature),  # app.py
+    "sketch": (generate_sketch_image, graphic_signature),          # NEWapp.py
+}
+
+
+def outfit_image(outfit, style="unified"):
+    """PNG bytes for the `style` drawing of outfit, cached per signature across apps, reruns and sessions."""
+    draw, signature = IMAGE_STYLES[style]
+    return encoded(f"style_engine.outfit.{style}", signature(outfit), lambda: draw(outfit))
+
+
+# ==============================================================================
+# AVATAR RENDERER (gemini.py, UItest.py)
+# ==============================================================================
+class AvatarRenderer:
+    # Atlas mode (env AVATAR_ATLAS):
+    #   "lazy"  - render on first use, keep the most recent 64 in memory
+    #   "eager" - pre-render every combination into memory at startup
+    #   "disk"  - export every combination as PNG once, then serve those files
+    MODE = os.environ.get("AVATAR_ATLAS", "lazy")
+    SPRITE_DIR = os.environ.get("AVATAR_SPRITES", "avatar_sprites")
+
+    # Process-wide LRU of rendered avatars, shared across reruns, sessions and apps
+    cache = get_cache("style_engine.avatar", maxsize=256 if MODE == "eager" else 64)
+
+    @staticmethod
+    def signatures():
+        """Every possible visual signature (8 main x 8 accent x skirt/pants x outer/none)."""
+        return list(itertools.product(STYLE.colors, STYLE.colors, (False, True), (False, True)))
+
+    @staticmethod
+    def warm_up():
+        """
+        Build the atlas for the configured mode, once per process.
+        Returns the startup cost and memory (or disk) footprint.
+        """
+        def build():
+            keys = AvatarRenderer.signatures()
+            if AvatarRenderer.MODE == "eager":
+                stats = fill(AvatarRenderer.cache, keys, lambda key: AvatarRenderer.draw(*key))
+            elif AvatarRenderer.MODE == "disk":
+                missing = [k for k in keys if not os.path.exists(sprite_path(AvatarRenderer.SPRITE_DIR, k))]
+                stats = export_sprites(AvatarRenderer.SPRITE_DIR, missing, lambda key: AvatarRenderer.draw(*key))
+            else:
+                stats = {"count": 0, "seconds": 0.0}
+            return dict(stats, mode=AvatarRenderer.MODE)
+        return warm_once("style_engine.avatar", build)
+
+    @staticmethod
+    def signature(outfit):
+        """The only outfit fields the drawing depends on."""
+        meta = outfit["meta"]
+        return (
+            outfit["main_color"],
+            outfit["accent_color"],
+            bool(meta["is_skirt"]),
+            bool(meta["has_outer"] and outfit["items"]["outer"]),
+        )
+
+    @staticmethod
+    def render(outfit):
+        return AvatarRenderer.render_signature(AvatarRenderer.signature(outfit))
+
+    @staticmethod
+    def render_signature(key):
+        return AvatarRenderer.cache.get_or_create(key, lambda: AvatarRenderer.load(key))
+
+    @staticmethod
+    def encode_signature(key):
+        """PNG bytes (+ content hash) for a signature, encoded once per process."""
+        def render():
+            return AvatarRenderer.render_signature(key)
+        return encoded("style_engine.avatar", key, render)
+
+    @staticmethod
+    def render_batch(outfits, workers=None, encode=False):
+        """
+        Render a whole gallery in one call. Outfits with the same signature are rendered once;
+        cache hits are looked up in place, and only the misses are spread over the shared
+        render pool (PIL and numpy release the GIL in their heavy loops).
+        Images are returned in the order of `outfits`.
+        With encode=True the results are cached EncodedImage bytes instead of PIL images.
+        """
+        keys = [AvatarRenderer.signature(outfit) for outfit in outfits]
+        unique = list(dict.fromkeys(keys))
+        work = AvatarRenderer.encode_signature if encode else AvatarRenderer.render_signature
+        cache = encoded_cache("style_engine.avatar") if encode else AvatarRenderer.cache
+        missing = [key for key in unique if key not in cache]
+        images = {}
+        if workers and len(missing) > 1:
+            images.update(zip(missing, render_pool(workers).map(work, missing)))
+        for key in unique:
+            if key not in images:
+                images[key] = work(key)
+        return [images[key] for key in keys]
+
+    @staticmethod
+    def load(key):
+        if AvatarRenderer.MODE == "disk":
+            try:
+                img = load_sprite(AvatarRenderer.SPRITE_DIR, key)
+            except OSError:
+                img = None  # unreadable sprite (e.g. truncated): draw it instead
+            if img is not None:
+                return img
+        return AvatarRenderer.draw(*key)
+
+    # Fixed colors; "main" and "accent" come from the outfit
+    BACKGROUND = (250, 250, 250)
+    SKIN = (235, 215, 200)
+    SHOE = (30, 30, 30)
+    # Layer roles, in palette order for the numpy compositor
+    ROLES = ("background", "skin", "main", "accent", "shoe")
+    # Renderer (env AVATAR_RENDERER): "numpy" composites precomputed masks, "pil" draws every shape
+    RENDERER = os.environ.get("AVATAR_RENDERER", "numpy")
+
+    @staticmethod
+    def draw(main_color, accent_color, is_skirt, has_outer):
+        if AvatarRenderer.RENDERER == "pil":
+            return AvatarRenderer.draw_pil(main_color, accent_color, is_skirt, has_outer)
+        return AvatarRenderer.composite(main_color, accent_color, is_skirt, has_outer)
+
+    @staticmethod
+    def paint(draw, is_skirt, has_outer, c_bg, c_skin, c_main, c_accent, c_shoe):
+        """The avatar geometry on the 500x900 canvas, back to front."""
+        # --- DRAWING LAYERS ---
+
+        # 1. Body/Head
+        # Head
+        draw.ellipse([200, 50, 300, 160], fill=c_skin)
+        # Neck
+        draw.rectangle([235, 150, 265, 190], fill=c_skin)
+
+        # 2. Bottoms
+        # If skirt, draw specialized shape
+        pants_color = c_main # Monochromatic base usually looks good for bottoms
+
+        if is_skirt:
+            # Skirt shape
+            draw.polygon([
+                (180, 450), (320, 450), # Waist
+                (360, 650), (140, 650)  # Hem
+            ], fill=pants_color)
+            # Legs
+            draw.rectangle([210, 650, 240, 800], fill=c_skin)
+            draw.rectangle([260, 650, 290, 800], fill=c_skin)
+        else:
+            # Pants shape
+            draw.rectangle([180, 450, 320, 800], fill=pants_color)
+            # Gap between legs
+            draw.polygon([(245, 450), (255, 450), (255, 800), (245, 800)], fill=c_bg)
+
+        # 3. Inner Top
+        inner_color = c_accent
+        draw.rectangle([180, 180, 320, 460], fill=inner_color) # Torso
+        draw.rectangle([150, 180, 190, 350], fill=inner_color) # Left Arm base
+        draw.rectangle([310, 180, 350, 350], fill=inner_color) # Right Arm base
+
+        # Hands
+        draw.ellipse([140, 340, 190, 390], fill=c_skin)
+        draw.ellipse([310, 340, 360, 390], fill=c_skin)
+
+        # 4. Outerwear (if creates)
+        if has_outer:
+            outer_color = c_main
+            # Open Jacket look
+            draw.rectangle([140, 170, 210, 480], fill=outer_color) # Left panel
+            draw.rectangle([290, 170, 360, 480], fill=outer_color) # Right panel
+            # Sleeves
+            draw.rectangle([120, 180, 170, 420], fill=outer_color)
+            draw.rectangle([330, 180, 380, 420], fill=outer_color)
+
+        # 5. Shoes
+        draw.rectangle([190, 800, 240, 850], fill=c_shoe)
+        draw.rectangle([260, 800, 310, 850], fill=c_shoe)
+
+    @staticmethod
+    def draw_pil(main_color, accent_color, is_skirt, has_outer):
+        # High-res canvas for anti-aliasing (resize down later)
+        W, H = 500, 900
+        img = Image.new("RGB", (W, H), AvatarRenderer.BACKGROUND)
+        draw = ImageDraw.Draw(img)
+        AvatarRenderer.paint(
+            draw, is_skirt, has_outer,
+            AvatarRenderer.BACKGROUND, AvatarRenderer.SKIN,
+            STYLE.color_map[main_color], STYLE.color_map[accent_color],
+            AvatarRenderer.SHOE
+        )
+
+        # Resize for better quality (Antialiasing hack)
+        return img.resize((250, 450), resample=Image.LANCZOS)
+
+    @staticmethod
+    def masks():
+        """
+        Per-layout (is_skirt, has_outer) weights of shape (450, 250, roles), built once per process.
+        The high-res drawing is painted with role numbers instead of colors, and each role's
+        coverage is LANCZOS-downsampled on its own. Resampling is linear, so
+        weights @ palette equals the downsampled color drawing, anti-aliasing included.
+        """
+        def build():
+            layouts = {}
+            for is_skirt, has_outer in itertools.product((False, True), (False, True)):
+                roles = Image.new("L", (500, 900), 0)
+                AvatarRenderer.paint(ImageDraw.Draw(roles), is_skirt, has_outer, 0, 1, 2, 3, 4)
+                roles = np.asarray(roles)
+                weights = np.stack([
+                    np.asarray(Image.fromarray((roles == r).astype(np.float32), mode="F")
+                               .resize((250, 450), resample=Image.LANCZOS))
+                    for r in range(len(AvatarRenderer.ROLES))
+                ], axis=-1)
+                layouts[(is_skirt, has_outer)] = weights
+            return layouts
+        return warm_once("style_engine.avatar.masks", build)
+
+    @staticmethod
+    def composite(main_color, accent_color, is_skirt, has_outer):
+        """One vectorized pass: precomputed role weights times this outfit's palette."""
+        palette = np.array([
+            AvatarRenderer.BACKGROUND, AvatarRenderer.SKIN,
+            STYLE.palette[STYLE.color_index[main_color]], STYLE.palette[STYLE.color_index[accent_color]],
+            AvatarRenderer.SHOE
+        ], dtype=np.float32)
+        rgb = AvatarRenderer.masks()[(is_skirt, has_outer)] @ palette
+        return Image.fromarray(np.clip(np.rint(rgb), 0, 255).astype(np.uint8), mode="RGB")
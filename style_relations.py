@@ -0,0 +1,163 @@
+from types import MappingProxyType
+
+import numpy as np
+
+# Compiled tables are shared by every Streamlit session and rerun in this process,
+# keyed on the relation data itself so an edited dict gets a fresh table.
+_tables = {}
+_pair_tables = {}
+
+
+class RelationTable:
+    """
+    Immutable, index-based form of a nested relation dict such as GENRE_RELATIONS.
+    matrix[i, j] is how strongly a liking for keys[j] implies keys[i] (symmetric).
+    """
+    __slots__ = ("keys", "index", "matrix", "conflicts", "_closures")
+
+    def __init__(self, keys, matrix, conflicts=()):
+        self.keys = tuple(keys)
+        self.index = MappingProxyType({key: i for i, key in enumerate(self.keys)})
+        matrix = np.array(matrix, dtype=float)
+        matrix.setflags(write=False)
+        self.matrix = matrix
+        self.conflicts = tuple(conflicts)
+        self._closures = {}
+
+    @classmethod
+    def from_dict(cls, relations, keys):
+        """
+        Symmetrize a relation dict. Pairs listed in one direction only are mirrored;
+        pairs listed in both directions with different values take the larger one
+        and are recorded in `conflicts` (a, b, a->b, b->a) for inspection.
+        Unknown names are rejected up front instead of silently scoring 0.
+        """
+        keys = tuple(keys)
+        index = {key: i for i, key in enumerate(keys)}
+        unknown = sorted(
+            {name for name in relations if name not in index}
+            | {name for row in relations.values() for name in row if name not in index}
+        )
+        if unknown:
+            raise ValueError(f"relation table refers to unknown keys: {', '.join(unknown)}")
+
+        n = len(keys)
+        matrix = np.zeros((n, n))
+        conflicts = []
+        for i, key in enumerate(keys):
+            for j, other_key in enumerate(keys):
+                if i == j:
+                    continue
+                forward = relations.get(other_key, {}).get(key, 0)
+                reverse = relations.get(key, {}).get(other_key, 0)
+                matrix[i, j] = max(forward, reverse)
+                if forward and reverse and forward != reverse and i < j:
+                    conflicts.append((other_key, key, forward, reverse))
+        return cls(keys, matrix, conflicts)
+
+    def affinity(self, key, other_key):
+        return float(self.matrix[self.index[key], self.index[other_key]])
+
+    def closure(self, hops=2, mode="max", decay=0.5):
+        """
+        Affinity over paths of up to `hops` steps through the relation graph,
+        computed once per (hops, mode, decay) and then reused.
+        - "max": strongest single path, the product of affinities along it
+          (Streetwear -> Casual -> Minimal = 0.6 * 0.7).
+        - "sum": evidence from every simple path (no key visited twice) combined as
+          1 - prod(1 - strength), each extra step weighted by `decay`. Extra paths only
+          strengthen a relation, and it stays below 1 without clipping.
+        """
+        if hops <= 1:
+            return self.matrix
+        cache_key = (hops, mode, decay)
+        if cache_key not in self._closures:
+            A = self.matrix
+            off_diagonal = ~np.eye(len(A), dtype=bool)
+            if mode == "max":
+                C = A.copy()
+                for _ in range(hops - 1):
+                    # C[i, j] = max over m of A[i, m] * C[m, j]
+                    step = (A[:, :, None] * C[None, :, :]).max(axis=1)
+                    C = np.maximum(C, step) * off_diagonal
+            elif mode == "sum":
+                C = 1.0 - self._path_miss(hops, decay)
+            else:
+                raise ValueError(f"unknown propagation mode: {mode}")
+            C.setflags(write=False)
+            self._closures[cache_key] = C
+        return self._closures[cache_key]
+
+    def _path_miss(self, hops, decay):
+        """miss[i, j] = prod over simple paths j -> ... -> i of (1 - decayed path strength)."""
+        A = self.matrix
+        miss = np.ones_like(A)
+        for start in range(len(A)):
+            stack = [((start,), 1.0)]
+            while stack:
+                path, strength = stack.pop()
+                node = path[-1]
+                for nxt in np.flatnonzero(A[:, node]):
+                    if nxt in path:
+                        continue
+                    step = strength * A[nxt, node]
+                    miss[nxt, start] *= 1.0 - decay ** (len(path) - 1) * step
+                    if len(path) < hops:
+                        stack.append((path + (nxt,), step))
+        return miss
+
+
+class PairTable:
+    """
+    Immutable, index-based form of a color pairing dict ({color: [good partners]}).
+    Aliases map names that are not real keys (e.g. "Denim") onto ones that are.
+    """
+    __slots__ = ("keys", "index", "partners")
+
+    def __init__(self, keys, partners):
+        self.keys = tuple(keys)
+        self.index = MappingProxyType({key: i for i, key in enumerate(self.keys)})
+        self.partners = tuple(tuple(p) for p in partners)
+
+    @classmethod
+    def from_dict(cls, pairs, keys, aliases=None):
+        keys = tuple(keys)
+        index = {key: i for i, key in enumerate(keys)}
+        aliases = aliases or {}
+        partners = []
+        for key in keys:
+            row = []
+            for name in pairs.get(key, keys):
+                name = aliases.get(name, name)
+                if name not in index:
+                    raise ValueError(f"pairing for {key} refers to unknown key: {name}")
+                if index[name] not in row:
+                    row.append(index[name])
+            partners.append(row)
+        return cls(keys, partners)
+
+    def candidates(self, key):
+        return [self.keys[i] for i in self.partners[self.index[key]]]
+
+
+def _freeze(mapping):
+    return tuple(
+        (key, tuple(value.items()) if isinstance(value, dict) else tuple(value))
+        for key, value in mapping.items()
+    )
+
+
+def relation_table(relations, keys):
+    """Build (once per process) the RelationTable for this relation data."""
+    cache_key = (_freeze(relations), tuple(keys))
+    if cache_key not in _tables:
+        _tables[cache_key] = RelationTable.from_dict(relations, keys)
+    return _tables[cache_key]
+
+
+def pair_table(pairs, keys, aliases=None):
+    """Build (once per process) the PairTable for this pairing data."""
+    cache_key = (_freeze(pairs), tuple(keys), tuple((aliases or {}).items()))
+    if cache_key not in _pair_tables:
+        _pair_tables[cache_key] = PairTable.from_dict(pairs, keys, aliases)
+    return _pair_tables[cache_key]